@@ -1,7 +1,10 @@
 import streamlit as st
-from streamlit_agraph import agraph, Node, Edge, Config
+import streamlit.components.v1 as components
 import json
+import os
 import urllib.parse
+from path_codec import PayloadError, fetch_payload_token, inflate_payload, unpack_payload, validate_paths
+from path_render import EmbedCache, EmbedProfile, create_graph_from_paths, render_paths_html
 
 st.set_page_config(layout="wide", page_title="BIMei Graph Viewer")
 
@@ -28,140 +31,105 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def get_node_color(node_type):
-    colors = {
-        'Construct': '#3498db',
-        'InformationUse': '#e74c3c', 
-        'ActionStatement': '#2ecc71',
-        'DictionaryItem': '#f39c12',
-        'Content': '#9b59b6',
-        'Deliverable': '#e67e22',
-        'Resource': '#1abc9c'
-    }
-    return colors.get(node_type, '#95a5a6')
-
-def parse_path_data():
-    """Parse path data from URL parameters"""
+def read_payload_param():
+    """(kind, raw value) of the path payload in the URL: ?p= (compact), ?pid= (stored) or ?paths= (JSON)"""
     query_params = st.query_params
     
-    st.write("Debug - Query params:", dict(query_params))
-    
-    if 'paths' in query_params:
-        try:
-            # Decode URL-encoded JSON
-            paths_json = urllib.parse.unquote(query_params['paths'])
-            st.write("Debug - Decoded JSON:", paths_json[:200] + "...")
-            paths_data = json.loads(paths_json)
-            st.write("Debug - Parsed data:", paths_data)
-            return paths_data
-        except Exception as e:
-            st.error(f"Error parsing path data: {e}")
-            return None
-    
-    return None
+    for kind in ('p', 'pid', 'paths'):
+        if kind in query_params:
+            return kind, query_params[kind]
+    return None, None
 
-def create_graph_from_paths(paths_data):
-    """Convert path data to graph nodes and edges"""
-    if not paths_data or not isinstance(paths_data, list):
-        return {'nodes': [], 'edges': []}
-    
-    # Take only the top path for visualization
-    top_path = paths_data[0] if paths_data else None
-    if not top_path:
-        return {'nodes': [], 'edges': []}
-    
-    nodes_dict = {}
-    edges = []
-    
-    # Extract nodes from path
-    path_nodes = top_path.get('nodes', [])
-    path_rels = top_path.get('rels', [])
-    
-    # Create nodes
-    for i, node in enumerate(path_nodes):
-        node_id = node.get('id', f"node_{i}")
-        node_type = node.get('type', 'Unknown')
-        node_label = node.get('label', f"Node {i}")
-        
-        nodes_dict[node_id] = {
-            'id': node_id,
-            'label': node_label[:30] + "..." if len(node_label) > 30 else node_label,
-            'type': node_type,
-            'color': get_node_color(node_type),
-            'size': 25
-        }
-    
-    # Create edges between consecutive nodes
-    for i in range(len(path_nodes) - 1):
-        source_id = path_nodes[i].get('id', f"node_{i}")
-        target_id = path_nodes[i + 1].get('id', f"node_{i+1}")
-        rel_type = path_rels[i] if i < len(path_rels) else 'CONNECTED_TO'
+def debug_mode():
+    query_params = st.query_params
+    return os.getenv("GRAPH_VIEWER_DEBUG") == "1" or query_params.get('debug') == "1"
+
+def parse_path_data(kind, raw, profile):
+    """Decode the path payload read by read_payload_param, timing decode and parse separately"""
+    try:
+        with profile.stage('decode'):
+            if kind == 'paths':
+                # URL-encoded JSON
+                version, body = None, urllib.parse.unquote(raw).encode('utf-8')
+            else:
+                token = fetch_payload_token(raw) if kind == 'pid' else raw
+                version, body = inflate_payload(token)
+        profile.size('decoded bytes', len(body))
         
-        edges.append({
-            'source': source_id,
-            'target': target_id,
-            'label': rel_type,
-            'type': rel_type
-        })
+        with profile.stage('parse'):
+            paths = json.loads(body) if version is None else unpack_payload(version, body)
+            return validate_paths(paths)
+    except (PayloadError, ValueError, RecursionError) as e:
+        st.error(f"Error parsing path data: {e}")
+        return None
+
+@st.cache_resource
+def get_embed_cache():
+    # One cache per process, shared by every session and iframe load
+    return EmbedCache()
+
+def build_embed(kind, raw, profile):
+    """Parse + build stage, served from the embed cache when the same payload was seen before"""
+    cache = get_embed_cache()
+    profile.size('payload chars', len(raw))
+    with profile.stage('cache lookup'):
+        key = cache.key(kind, raw)
+        embed = cache.get(key)
+    if embed is not None:
+        profile.size('html bytes', len(embed['html'] or ''))
+        return embed, True
     
-    return {
-        'nodes': list(nodes_dict.values()),
-        'edges': edges
+    paths_data = parse_path_data(kind, raw, profile)
+    if not paths_data:
+        return None, False
+    with profile.stage('build'):
+        graph_data = create_graph_from_paths(paths_data)
+    with profile.stage('render'):
+        html = render_paths_html(graph_data, height=400) if graph_data['nodes'] else None
+    embed = {
+        'html': html,
+        'paths': len(graph_data['paths']),
+        'nodes': len(graph_data['nodes']),
+        'edges': len(graph_data['edges'])
     }
+    profile.size('html bytes', len(html or ''))
+    cache.put(key, embed, len(html or ''))
+    return embed, False
 
 # Main app logic
 def main():
     # Check if we're in API mode (have path data)
-    paths_data = parse_path_data()
+    kind, raw = read_payload_param()
     
-    if paths_data:
+    if kind:
         # API mode - show only the graph
-        graph_data = create_graph_from_paths(paths_data)
+        # Timings are always cheap to take, but only shown in debug mode
+        profile = EmbedProfile()
+        embed, cached = build_embed(kind, raw, profile)
         
-        if graph_data['nodes']:
-            # Create visualization nodes and edges
-            vis_nodes = [
-                Node(
-                    id=node['id'],
-                    label=node['label'],
-                    size=node['size'],
-                    color=node['color']
-                ) for node in graph_data['nodes']
-            ]
-            
-            vis_edges = [
-                Edge(
-                    source=edge['source'],
-                    target=edge['target'],
-                    label=edge['label']
-                ) for edge in graph_data['edges']
-            ]
-            
-            # Graph configuration for embedded mode
-            config = Config(
-                width=600,
-                height=400,
-                directed=True,
-                physics=True,
-                hierarchical=False,
-                nodeHighlightBehavior=True,
-                highlightColor="#f37f73",
-                node={'font': {'size': 14}},
-                edge={'font': {'size': 12}},
-                interaction={'dragNodes': True, 'dragView': True, 'zoomView': True}
-            )
-            
-            # Render the graph
-            agraph(nodes=vis_nodes, edges=vis_edges, config=config)
+        if embed and embed['html']:
+            # Every ranked path in one render; the selector highlights a path in the browser
+            components.html(embed['html'], height=440)
             
             # Show path info
-            st.caption(f"Showing top path: {len(graph_data['nodes'])} nodes, {len(graph_data['edges'])} relationships")
-        else:
+            st.caption(f"Showing {embed['paths']} paths: {embed['nodes']} nodes, {embed['edges']} relationships")
+        elif embed:
             st.info("No graph data to display")
+        
+        if debug_mode():
+            st.caption(f"Profile · {profile.summary()}")
+            stats = get_embed_cache().stats()
+            st.caption(
+                f"Embed cache {'hit' if cached else 'miss'} · {stats['hits']} hits / {stats['misses']} misses "
+                f"({stats['hit_rate']:.0%}) · {stats['entries']} entries, {stats['bytes'] / 1024:.0f} KB, "
+                f"{stats['evictions']} evictions"
+            )
     else:
         # Standalone mode - show instructions
         st.title("🔍 BIMei Graph Viewer API")
         st.info("This is the API endpoint for graph visualization. Pass path data via URL parameters.")
+        st.code("?p=" + "<path_codec.encode_paths(paths)>")
+        st.caption("Stored payloads: ?pid=<path_codec.store_payload(paths)>. Legacy JSON is still accepted:")
         st.code("?paths=" + urllib.parse.quote('{"paths":[{"nodes":[...],"rels":[...]}]}'))
 
 if __name__ == "__main__":
@@ -1,7 +1,14 @@
 import streamlit as st
 from streamlit_agraph import agraph, Node, Edge, Config
 from neo4j import GraphDatabase
+from graph_converter import first_of, result_to_graph
+from graph_view import graph_view_for
+from query_cache import invalidation_stamp, make_key, query_cache
+from search import (CANDIDATE_IDS, CANDIDATE_PAIRS, SEARCH_QUERY, ensure_fulltext_index,
+                    lucene_query, path_search_params, search_params)
+from path_engine import PathEngine
 import random
+import html
 import json
 import os
 
@@ -144,8 +151,72 @@ def load_relationship_weights():
 
 weights = load_relationship_weights()
 
-# Helper functions (same as before)
-def convert_natural_to_cypher(natural_text):
+@st.cache_resource
+def ensure_search_index():
+    """Create the full-text index once per process; False means fall back to CONTAINS scans"""
+    try:
+        with driver.session() as session:
+            return ensure_fulltext_index(session)
+    except Exception as e:
+        st.warning(f"Full-text search unavailable, using slower scans: {e}")
+        return False
+
+fulltext_ready = ensure_search_index()
+
+# Optional: answer "connection between" queries from an in-process CSR snapshot
+# instead of running apoc.algo.dijkstra on the database
+LOCAL_PATH_ENGINE = os.getenv("LOCAL_PATH_ENGINE", "0") == "1"
+LOCAL_PATH_K = int(os.getenv("LOCAL_PATH_K", "3"))
+
+@st.cache_resource(ttl=600, max_entries=1)
+def load_path_engine(stamp):
+    """Snapshot keyed on the query cache stamp, so a migration or sync rebuilds it"""
+    with driver.session() as session:
+        return PathEngine.from_session(session, weights)
+
+def get_path_engine():
+    return load_path_engine(invalidation_stamp())
+
+# Helper functions
+# Fixed, parameterised query shapes: user terms only ever travel as parameters,
+# so Neo4j can reuse one cached plan per template
+NOT_CHUNK = "NOT 'Chunk' IN labels(n) AND NOT 'Chunk' IN labels(m)"
+CYPHER_TEMPLATES = {
+    'path': CANDIDATE_PAIRS + """
+        CALL apoc.algo.dijkstra(a, b, '', 'weight', 1.0) YIELD path, weight
+        RETURN path ORDER BY weight DESC LIMIT 1
+        """,
+    'search': SEARCH_QUERY,
+    'path_scan': """
+        MATCH (a), (b)
+        WHERE (toLower(a.title) CONTAINS $term1 OR toLower(a.name) CONTAINS $term1)
+        AND (toLower(b.title) CONTAINS $term2 OR toLower(b.name) CONTAINS $term2)
+        WITH a, b
+        CALL apoc.algo.dijkstra(a, b, '', 'weight', 1.0) YIELD path, weight
+        RETURN path ORDER BY weight DESC LIMIT 1
+        """,
+    'content': f"MATCH (n)-[r]-(m) WHERE {NOT_CHUNK} RETURN n, r, m LIMIT $limit",
+    'categories': "MATCH (n) WHERE NOT 'Chunk' IN labels(n) RETURN DISTINCT labels(n) as category, count(n) as count ORDER BY count DESC LIMIT $limit",
+    'random': f"MATCH (n)-[r]-(m) WHERE {NOT_CHUNK} RETURN n, r, m ORDER BY rand() LIMIT $limit",
+    'search_scan': f"""
+        MATCH (n)-[r]-(m)
+        WHERE {NOT_CHUNK}
+        AND (toLower(n.title) CONTAINS $term OR toLower(n.name) CONTAINS $term
+             OR toLower(m.title) CONTAINS $term OR toLower(m.name) CONTAINS $term)
+        RETURN n, r, m LIMIT $limit
+        """,
+    'expand': "MATCH (n)-[r]-(m) WHERE elementId(n) = $node_id RETURN n, r, m LIMIT $limit",
+    'relationships': "MATCH (a)-[r]->(b) WHERE elementId(r) IN $rel_ids RETURN a, r, b LIMIT $limit",
+}
+# Templates whose result differs on every run (ORDER BY rand()) bypass the result cache
+UNCACHED_QUERIES = {CYPHER_TEMPLATES['random']}
+
+def convert_natural_to_cypher(natural_text, fulltext=True):
+    """Map plain English to one of CYPHER_TEMPLATES; returns (query, params).
+
+    With `fulltext`, term searches resolve candidates through the full-text
+    index; otherwise they use the CONTAINS scan templates.
+    """
     text = natural_text.lower()
     
     if "connection between" in text or "relationship between" in text or "path between" in text:
@@ -155,40 +226,30 @@ def convert_natural_to_cypher(natural_text):
                 term1, term2 = after_between.split(" and ", 1)
                 term1 = term1.strip().strip("'\"")
                 term2 = term2.strip().strip("'\"")
-                
-                return f"""
-                MATCH (a), (b)
-                WHERE (toLower(a.title) CONTAINS '{term1}' OR toLower(a.name) CONTAINS '{term1}') 
-                AND (toLower(b.title) CONTAINS '{term2}' OR toLower(b.name) CONTAINS '{term2}')
-                WITH a, b
-                CALL apoc.algo.dijkstra(a, b, '', 'weight', 1.0) YIELD path, weight
-                RETURN path ORDER BY weight DESC LIMIT 1
-                """
+                if fulltext and lucene_query(term1) and lucene_query(term2):
+                    return CYPHER_TEMPLATES['path'], path_search_params(term1, term2)
+                return CYPHER_TEMPLATES['path_scan'], {'term1': term1, 'term2': term2}
     
     if "all content" in text or "show content" in text:
-        return "MATCH (n)-[r]-(m) WHERE NOT 'Chunk' IN labels(n) AND NOT 'Chunk' IN labels(m) RETURN n, r, m"
+        return CYPHER_TEMPLATES['content'], {}
     
     elif "relationships" in text or "connections" in text:
-        return "MATCH (n)-[r]-(m) WHERE NOT 'Chunk' IN labels(n) AND NOT 'Chunk' IN labels(m) RETURN n, r, m"
+        return CYPHER_TEMPLATES['content'], {}
     
     elif "categories" in text or "types" in text:
-        return "MATCH (n) WHERE NOT 'Chunk' IN labels(n) RETURN DISTINCT labels(n) as category, count(n) as count ORDER BY count DESC"
+        return CYPHER_TEMPLATES['categories'], {}
     
     elif "random" in text or "sample" in text:
-        return "MATCH (n)-[r]-(m) WHERE NOT 'Chunk' IN labels(n) AND NOT 'Chunk' IN labels(m) RETURN n, r, m ORDER BY rand() LIMIT 20"
+        return CYPHER_TEMPLATES['random'], {}
     
     search_terms = [word for word in text.split() if len(word) > 2 and word not in ['show', 'me', 'the', 'all', 'content', 'with', 'about']]
     if search_terms:
         term = search_terms[0]
-        return f"""
-        MATCH (n)-[r]-(m) 
-        WHERE NOT 'Chunk' IN labels(n) AND NOT 'Chunk' IN labels(m)
-        AND (toLower(n.title) CONTAINS '{term}' OR toLower(n.name) CONTAINS '{term}' 
-             OR toLower(m.title) CONTAINS '{term}' OR toLower(m.name) CONTAINS '{term}')
-        RETURN n, r, m
-        """
+        if fulltext and lucene_query(term):
+            return CYPHER_TEMPLATES['search'], search_params(term)
+        return CYPHER_TEMPLATES['search_scan'], {'term': term}
     
-    return "MATCH (n)-[r]-(m) WHERE NOT 'Chunk' IN labels(n) AND NOT 'Chunk' IN labels(m) RETURN n, r, m LIMIT 20"
+    return CYPHER_TEMPLATES['content'], {}
 
 def get_node_color(labels):
     colors = {
@@ -202,103 +263,63 @@ def get_node_color(labels):
         return colors.get(labels[0], '#95a5a6')
     return '#95a5a6'
 
-def run_cypher_query(query, limit=50):
+def build_viewer_node(node_id, labels, props):
+    title = str(first_of(props, ('title', 'name', 'label', 'description'),
+                         labels[0] if labels else f"Node {node_id[-8:]}"))
+    return {
+        'id': node_id,
+        'label': title[:40] + "..." if len(title) > 40 else title,
+        'full_label': title,
+        'labels': labels,
+        'properties': props,
+        'size': 25,
+        'color': get_node_color(labels)
+    }
+
+def build_viewer_edge(rel_id, rel_type, source, target, props):
+    return {
+        'source': source,
+        'target': target,
+        'label': rel_type,
+        'properties': props
+    }
+
+def run_cypher_query(query, params=None, limit=50):
+    # Shared by every session in this process; only successful, deterministic results are cached
+    cacheable = query not in UNCACHED_QUERIES
+    cache_key = make_key(query, params, limit)
+    cached = query_cache.get(cache_key) if cacheable else None
+    if cached is not None:
+        return cached, None
+    
     try:
         with driver.session() as session:
-            result = session.run(f"{query} LIMIT {limit}")
-            
-            nodes = {}
-            edges = []
-            
-            for record in result:
-                for key, value in record.items():
-                    if hasattr(value, 'labels'):
-                        node_id = value.element_id
-                        if node_id not in nodes:
-                            title = value.get('title') or value.get('name') or value.get('label') or value.get('description') or list(value.labels)[0] if value.labels else f"Node {node_id[-8:]}"
-                            nodes[node_id] = {
-                                'id': node_id,
-                                'label': title[:40] + "..." if len(title) > 40 else title,
-                                'full_label': title,
-                                'labels': list(value.labels),
-                                'properties': dict(value),
-                                'size': 25,
-                                'color': get_node_color(list(value.labels))
-                            }
-                    
-                    elif hasattr(value, 'type'):
-                        start_node = value.start_node
-                        end_node = value.end_node
-                        
-                        for node in [start_node, end_node]:
-                            node_id = node.element_id
-                            if node_id not in nodes:
-                                title = node.get('title') or node.get('name') or node.get('label') or node.get('description') or (list(node.labels)[0] if node.labels else f"Node {node_id[-8:]}")
-                                nodes[node_id] = {
-                                    'id': node_id,
-                                    'label': title[:40] + "..." if len(title) > 40 else title,
-                                    'full_label': title,
-                                    'labels': list(node.labels),
-                                    'properties': dict(node),
-                                    'size': 25,
-                                    'color': get_node_color(list(node.labels))
-                                }
-                        
-                        edges.append({
-                            'source': start_node.element_id,
-                            'target': end_node.element_id,
-                            'label': value.type,
-                            'properties': dict(value)
-                        })
-                    
-                    elif hasattr(value, '__iter__') and not isinstance(value, str):
-                        try:
-                            for item in value:
-                                if hasattr(item, 'labels'):
-                                    node_id = item.element_id
-                                    if node_id not in nodes:
-                                        title = item.get('title') or item.get('name') or item.get('label') or item.get('description') or (list(item.labels)[0] if item.labels else f"Node {node_id[-8:]}")
-                                        nodes[node_id] = {
-                                            'id': node_id,
-                                            'label': title[:40] + "..." if len(title) > 40 else title,
-                                            'full_label': title,
-                                            'labels': list(item.labels),
-                                            'properties': dict(item),
-                                            'size': 25,
-                                            'color': get_node_color(list(item.labels))
-                                        }
-                                elif hasattr(item, 'type'):
-                                    start_node = item.start_node
-                                    end_node = item.end_node
-                                    
-                                    for node in [start_node, end_node]:
-                                        node_id = node.element_id
-                                        if node_id not in nodes:
-                                            title = node.get('title') or node.get('name') or node.get('label') or node.get('description') or (list(node.labels)[0] if node.labels else f"Node {node_id[-8:]}")
-                                            nodes[node_id] = {
-                                                'id': node_id,
-                                                'label': title[:40] + "..." if len(title) > 40 else title,
-                                                'full_label': title,
-                                                'labels': list(node.labels),
-                                                'properties': dict(node),
-                                                'size': 25,
-                                                'color': get_node_color(list(node.labels))
-                                            }
-                                    
-                                    edges.append({
-                                        'source': start_node.element_id,
-                                        'target': end_node.element_id,
-                                        'label': item.type,
-                                        'properties': dict(item)
-                                    })
-                        except:
-                            pass
-            
-            return {'nodes': list(nodes.values()), 'edges': edges}, None
+            result = session.run(query, {**(params or {}), 'limit': limit})
+            data = result_to_graph(result, build_viewer_node, build_viewer_edge)
+            if cacheable:
+                query_cache.put(cache_key, data)
+            return data, None
             
     except Exception as e:
         return None, str(e)
 
+def run_local_path_query(params, k=LOCAL_PATH_K):
+    """Resolve both candidate sets, rank k paths locally, then fetch only those relationships"""
+    try:
+        with driver.session() as session:
+            sources = session.run(CANDIDATE_IDS, index=params['index'], search=params['search1'],
+                                  candidates=params['candidates']).single()['ids']
+            targets = session.run(CANDIDATE_IDS, index=params['index'], search=params['search2'],
+                                  candidates=params['candidates']).single()['ids']
+        paths = get_path_engine().k_best_paths(sources, targets, k)
+    except Exception as e:
+        return None, str(e)
+    
+    rel_ids = list(dict.fromkeys(rel for path in paths for rel in path['rels']))
+    if not rel_ids:
+        return {'nodes': [], 'edges': []}, None
+    return run_cypher_query(CYPHER_TEMPLATES['relationships'], {'rel_ids': rel_ids}, len(rel_ids))
+
 # Initialize session state
 if 'current_data' not in st.session_state:
     st.session_state.current_data = {'nodes': [], 'edges': []}
@@ -330,7 +351,7 @@ st.markdown('</div>', unsafe_allow_html=True)
 
 # Process query
 if run_query and natural_query.strip():
-    cypher_query = convert_natural_to_cypher(natural_query)
+    cypher_query, cypher_params = convert_natural_to_cypher(natural_query, fulltext_ready)
     st.session_state.show_cypher = True
     
     # Show generated Cypher
@@ -338,17 +359,24 @@ if run_query and natural_query.strip():
     <div class="cypher-display">
         <div style="font-size: 0.75rem; color: #64748b; margin-bottom: 0.5rem;">Generated Cypher ></div>
         <code>{cypher_query}</code>
+        <div style="font-size: 0.75rem; color: #64748b; margin-top: 0.5rem;">Parameters: <code>{html.escape(json.dumps({**cypher_params, 'limit': limit}))}</code></div>
     </div>
     """, unsafe_allow_html=True)
     
     # Run query
     with st.spinner("Running query..."):
-        data, error = run_cypher_query(cypher_query, limit)
+        if LOCAL_PATH_ENGINE and cypher_query is CYPHER_TEMPLATES['path']:
+            data, error = run_local_path_query(cypher_params)
+        else:
+            data, error = run_cypher_query(cypher_query, cypher_params, limit)
         if error:
             st.error(f"Query error: {error}")
         else:
             st.session_state.current_data = data
             st.success(f"✅ Found {len(data['nodes'])} nodes and {len(data['edges'])} relationships")
+            cache_stats = query_cache.stats()
+            st.caption(f"Query cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                       f"({cache_stats['entries']} entries)")
 
 # Main content area
 col1, col2 = st.columns([3, 1])
@@ -370,12 +398,10 @@ with col1:
     # Graph visualization
     if st.session_state.current_data['nodes']:
         node_distance = {"Compact": 100, "Normal": 200, "Spread Out": 350}[layout_type]
+        view = graph_view_for(st.session_state)
         
         vis_nodes = []
-        for node in st.session_state.current_data['nodes']:
-            if 'Chunk' in node['labels']:
-                continue
-            
+        for node in view.visible_nodes():
             node_size = node['size']
             if st.session_state.selected_node and node['id'] == st.session_state.selected_node['id']:
                 node_size = int(node['size'] * 1.3)
@@ -389,13 +415,7 @@ with col1:
             ))
         
         vis_edges = []
-        for edge in st.session_state.current_data['edges']:
-            source_node = next((n for n in st.session_state.current_data['nodes'] if n['id'] == edge['source']), None)
-            target_node = next((n for n in st.session_state.current_data['nodes'] if n['id'] == edge['target']), None)
-            
-            if (source_node and 'Chunk' in source_node['labels']) or (target_node and 'Chunk' in target_node['labels']):
-                continue
-            
+        for edge in view.visible_edges():
             rel_type = edge['label']
             weight = weights.get(rel_type, 0.5)
             line_width = max(2, int(weight * 6))
@@ -424,7 +444,7 @@ with col1:
         selected = agraph(nodes=vis_nodes, edges=vis_edges, config=config)
         
         if selected:
-            selected_node_data = next((node for node in st.session_state.current_data['nodes'] if node['id'] == selected), None)
+            selected_node_data = view.get(selected)
             if selected_node_data:
                 st.session_state.selected_node = selected_node_data
     
@@ -473,9 +493,8 @@ with col2:
         
         # Expand button
         if st.button("🔍 Expand Node", use_container_width=True):
-            expand_query = f"MATCH (n)-[r]-(m) WHERE elementId(n) = '{node['id']}' RETURN n, r, m"
             with st.spinner("Expanding node..."):
-                data, error = run_cypher_query(expand_query, 50)
+                data, error = run_cypher_query(CYPHER_TEMPLATES['expand'], {'node_id': node['id']}, 50)
                 if not error:
                     st.session_state.current_data = data
                     st.rerun()
@@ -0,0 +1,156 @@
+"""
+Single-pass conversion of Neo4j query results into viewer graph data.
+Walks Node, Relationship, Path, list and map values once, deduplicates
+nodes and relationships by element_id and reads each entity's labels and
+properties exactly once before handing them to a node/edge factory.
+"""
+
+from array import array
+
+from neo4j.graph import Node, Path, Relationship
+
+
+def first_of(props, keys, default=None):
+    """First truthy property among `keys`, e.g. a title fallback chain"""
+    for key in keys:
+        value = props.get(key)
+        if value:
+            return value
+    return default
+
+
+def default_node(node_id, labels, props):
+    return {'id': node_id, 'labels': labels, 'properties': props}
+
+
+def default_edge(rel_id, rel_type, source, target, props):
+    return {'id': rel_id, 'source': source, 'target': target, 'label': rel_type, 'properties': props}
+
+
+class GraphCollector:
+    """Accumulates unique nodes and edges from any mix of Neo4j values.
+
+    node_factory(node_id, labels, props) and
+    edge_factory(rel_id, rel_type, source_id, target_id, props) build the
+    viewer-specific dicts; each is called once per distinct element_id.
+    """
+
+    def __init__(self, node_factory=None, edge_factory=None):
+        self.node_factory = node_factory or default_node
+        self.edge_factory = edge_factory or default_edge
+        self.nodes = {}
+        self.edges = {}
+
+    def add(self, value):
+        if isinstance(value, Node):
+            self.add_node(value)
+        elif isinstance(value, Relationship):
+            self.add_relationship(value)
+        elif isinstance(value, Path):
+            for node in value.nodes:
+                self.add_node(node)
+            for rel in value.relationships:
+                self.add_relationship(rel)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                self.add(item)
+        elif isinstance(value, dict):
+            for item in value.values():
+                self.add(item)
+
+    def add_node(self, node):
+        node_id = node.element_id
+        if node_id not in self.nodes:
+            self.nodes[node_id] = self.node_factory(node_id, list(node.labels), dict(node))
+        return node_id
+
+    def add_relationship(self, rel):
+        rel_id = rel.element_id
+        if rel_id not in self.edges:
+            source = self.add_node(rel.start_node)
+            target = self.add_node(rel.end_node)
+            self.edges[rel_id] = self.edge_factory(rel_id, rel.type, source, target, dict(rel))
+        return rel_id
+
+    def add_record(self, record):
+        for value in record.values():
+            self.add(value)
+
+    def add_result(self, result):
+        for record in result:
+            self.add_record(record)
+        return self
+
+    def graph(self):
+        return {'nodes': list(self.nodes.values()), 'edges': list(self.edges.values())}
+
+
+class ColumnarCollector(GraphCollector):
+    """Compact variant for large results: no per-entity dicts, only id lists and int arrays.
+
+    graph() returns {'ids', 'labels', 'node_label', 'types', 'edge_type',
+    'source', 'target'} where node_label/edge_type index into labels/types
+    (-1 for an unlabeled node) and source/target index into ids.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.ids = []
+        self.label_names = []
+        self.type_names = []
+        self._label_index = {}
+        self._type_index = {}
+        self.node_label = array('i')
+        self.edge_type = array('i')
+        self.source = array('i')
+        self.target = array('i')
+
+    @staticmethod
+    def _intern(value, names, index):
+        position = index.get(value)
+        if position is None:
+            position = index[value] = len(names)
+            names.append(value)
+        return position
+
+    def add_node(self, node):
+        node_id = node.element_id
+        position = self.nodes.get(node_id)
+        if position is None:
+            position = self.nodes[node_id] = len(self.ids)
+            self.ids.append(node_id)
+            label = next(iter(node.labels), None)
+            self.node_label.append(
+                -1 if label is None else self._intern(label, self.label_names, self._label_index)
+            )
+        return position
+
+    def add_relationship(self, rel):
+        rel_id = rel.element_id
+        if rel_id not in self.edges:
+            self.edges[rel_id] = len(self.edge_type)
+            self.source.append(self.add_node(rel.start_node))
+            self.target.append(self.add_node(rel.end_node))
+            self.edge_type.append(self._intern(rel.type, self.type_names, self._type_index))
+        return rel_id
+
+    def graph(self):
+        return {
+            'ids': self.ids,
+            'labels': self.label_names,
+            'node_label': self.node_label,
+            'types': self.type_names,
+            'edge_type': self.edge_type,
+            'source': self.source,
+            'target': self.target
+        }
+
+
+def result_to_graph(result, node_factory=None, edge_factory=None):
+    """Convert a neo4j Result (or any iterable of records) to {'nodes': [...], 'edges': [...]}"""
+    return GraphCollector(node_factory, edge_factory).add_result(result).graph()
+
+
+def result_to_columnar(result):
+    """Convert a neo4j Result to the compact columnar form of ColumnarCollector"""
+    return ColumnarCollector().add_result(result).graph()
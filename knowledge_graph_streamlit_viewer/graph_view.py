@@ -0,0 +1,47 @@
+"""
+Graph view model shared by the viewer rendering paths.
+Indexes the current query result by node id once, so edges can be
+filtered and nodes looked up without scanning the node list.
+"""
+
+HIDDEN_LABELS = ('Chunk',)
+
+
+class GraphView:
+    """Id index and Chunk-exclusion mask over {'nodes': [...], 'edges': [...]} data"""
+
+    def __init__(self, data, hidden_labels=HIDDEN_LABELS):
+        self.data = data
+        self.nodes = data.get('nodes', [])
+        self.edges = data.get('edges', [])
+        self.index = {node['id']: node for node in self.nodes}
+
+        hidden = set(hidden_labels)
+        self.node_visible = [not hidden.intersection(node.get('labels', ())) for node in self.nodes]
+        self.hidden_ids = {node['id'] for node, visible in zip(self.nodes, self.node_visible) if not visible}
+        self.edge_visible = [
+            edge['source'] not in self.hidden_ids and edge['target'] not in self.hidden_ids
+            for edge in self.edges
+        ]
+
+    def get(self, node_id):
+        return self.index.get(node_id)
+
+    def is_hidden(self, node_id):
+        return node_id in self.hidden_ids
+
+    def visible_nodes(self):
+        return [node for node, visible in zip(self.nodes, self.node_visible) if visible]
+
+    def visible_edges(self):
+        return [edge for edge, visible in zip(self.edges, self.edge_visible) if visible]
+
+
+def graph_view_for(state, key='current_data'):
+    """Return the GraphView for state[key], rebuilding it only when the data changes"""
+    data = state[key]
+    view = state.get('graph_view')
+    if view is None or view.data is not data:
+        view = GraphView(data)
+        state['graph_view'] = view
+    return view
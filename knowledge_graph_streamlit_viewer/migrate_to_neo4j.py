@@ -4,9 +4,33 @@ Migration script to import JSON graph data into Neo4j
 Run this once to migrate your existing data from JSON files to Neo4j
 """
 
+import argparse
+import hashlib
 import json
 import os
+import threading
+import time
+import zlib
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
 from neo4j import GraphDatabase
+from query_cache import invalidate_query_cache
+from search import ensure_fulltext_index
+
+try:
+    import ijson
+except ImportError:  # in requirements.txt; without it parallel mode loads .json inputs whole
+    ijson = None
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_WORKERS = 4
+# Parallel mode: how long the driver keeps retrying a deadlocked/transient write
+INGEST_RETRY_SECONDS = 60.0
+
+def default_graph_files():
+    """The ontology and library JSON files shipped next to this script, in load order"""
+    base = os.path.dirname(os.path.abspath(__file__))
+    paths = [os.path.join(base, name) for name in ("ontology_graph.json", "library_graph.json")]
+    return [path for path in paths if os.path.exists(path)]
 
 def load_json_data():
     """Load data from JSON files"""
@@ -115,17 +139,635 @@ def migrate_to_neo4j(uri, user, password):
     finally:
         driver.close()
 
+def node_label(node):
+    """Neo4j label for a JSON node, taken from its `type` field"""
+    label = "".join(ch for ch in str(node.get("type") or "") if ch.isalnum() or ch == "_")
+    if not label or label[0].isdigit():
+        return "Unknown"
+    return label
+
+def content_hash(*parts):
+    """Stable short hash of JSON-serialisable content, stored as `sync_hash`"""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+def node_row(node):
+    """Build the UNWIND row for a JSON node"""
+    label = node_label(node)
+    props = {
+        "label": node.get("label", node.get("id")),
+        "type": node.get("type", "Unknown"),
+        "desc": node.get("desc", ""),
+        "size": node.get("size", 20),
+        "shape": node.get("shape", "dot"),
+        "color": node.get("color", "#888")
+    }
+    props["sync_hash"] = content_hash(label, props)
+    return {"id": node.get("id"), "label": label, "props": props}
+
+def rel_type_for(edge):
+    """Relationship type for a JSON edge, e.g. 'is part of' -> IS_PART_OF"""
+    return (edge.get("label") or "RELATED").replace(" ", "_").upper()
+
+def edge_row(edge, rel_type):
+    """Build the UNWIND row for a JSON edge"""
+    return {
+        "source": edge["source"],
+        "target": edge["target"],
+        "hash": content_hash(edge["source"], rel_type, edge["target"])
+    }
+
+def chunked(items, size):
+    """Yield lists of at most `size` items from any iterable"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _write_batch(tx, query, rows):
+    tx.run(query, rows=rows).consume()
+
+def report_rate(phase, count, elapsed):
+    """Print throughput for a migration phase"""
+    rate = count / elapsed if elapsed > 0 else float(count)
+    print(f"  {phase}: {count} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+
+def run_batched(session, phase, query, rows, batch_size):
+    """Send rows through `query` in chunks, one write transaction per chunk"""
+    start = time.perf_counter()
+    count = 0
+    for batch in chunked(rows, batch_size):
+        session.execute_write(_write_batch, query, batch)
+        count += len(batch)
+    report_rate(phase, count, time.perf_counter() - start)
+    return count
+
+def clear_database(session, batch_size):
+    """Delete all nodes in bounded transactions instead of one huge one"""
+    start = time.perf_counter()
+    deleted = 0
+    while True:
+        count = session.execute_write(
+            lambda tx: tx.run(
+                "MATCH (n) WITH n LIMIT $limit DETACH DELETE n RETURN count(*) AS count",
+                limit=batch_size
+            ).single()["count"]
+        )
+        if not count:
+            break
+        deleted += count
+    report_rate("clear", deleted, time.perf_counter() - start)
+
+def collect_nodes(onto_data, lib_data):
+    """Merge ontology and library nodes by id; ontology nodes win on conflicts"""
+    rows = {}
+    for node in onto_data.get("nodes", []) + lib_data.get("nodes", []):
+        if node.get("id") and node["id"] not in rows:
+            rows[node["id"]] = node_row(node)
+    return rows
+
+def group_nodes(rows):
+    """Group node rows by label so MERGE can use the label's id constraint"""
+    groups = {}
+    for row in rows:
+        groups.setdefault(row["label"], []).append(row)
+    return groups
+
+def group_edges(edges, labels_by_id):
+    """Group edge rows by (type, source label, target label).
+
+    Relationship types and labels cannot be parameterised, and knowing both
+    endpoint labels lets each MATCH use the per-label id constraint instead
+    of scanning every node. Edges pointing at unknown ids are skipped.
+    """
+    groups = {}
+    skipped = 0
+    for edge in edges:
+        source_label = labels_by_id.get(edge.get("source"))
+        target_label = labels_by_id.get(edge.get("target"))
+        if not source_label or not target_label:
+            skipped += 1
+            continue
+        rel_type = rel_type_for(edge)
+        groups.setdefault((rel_type, source_label, target_label), []).append(
+            edge_row(edge, rel_type)
+        )
+    return groups, skipped
+
+def node_upsert_query(label):
+    return f"""
+        UNWIND $rows AS row
+        MERGE (n:`{label}` {{id: row.id}})
+        SET n += row.props
+    """
+
+def edge_merge_query(rel_type, source_label, target_label):
+    return f"""
+        UNWIND $rows AS row
+        MATCH (a:`{source_label}` {{id: row.source}})
+        MATCH (b:`{target_label}` {{id: row.target}})
+        MERGE (a)-[r:`{rel_type}`]->(b)
+        SET r.sync_hash = row.hash
+    """
+
+def upsert_nodes(session, node_groups, batch_size):
+    """MERGE node rows per label, relying on the label's id constraint"""
+    for label, rows in node_groups.items():
+        run_batched(session, f"nodes :{label}", node_upsert_query(label), rows, batch_size)
+
+def merge_edges(session, edge_groups, batch_size):
+    """MERGE edge rows per (type, source label, target label) group"""
+    for (rel_type, source_label, target_label), rows in edge_groups.items():
+        run_batched(session, f"edges (:{source_label})-[:{rel_type}]->(:{target_label})",
+                    edge_merge_query(rel_type, source_label, target_label), rows, batch_size)
+
+def ensure_schema(session, labels):
+    """Create a uniqueness constraint (and backing index) on `id` per label.
+
+    The constraint name keeps the label verbatim, so labels that differ only
+    in case ("IFC" / "Ifc") each get their own constraint.
+    """
+    for label in sorted(labels):
+        session.run(
+            f"CREATE CONSTRAINT `{label}_id_unique` IF NOT EXISTS "
+            f"FOR (n:`{label}`) REQUIRE n.id IS UNIQUE"
+        ).consume()
+    session.run("CALL db.awaitIndexes(300)").consume()
+    print(f"  Ensured id constraints for {len(labels)} labels: {', '.join(sorted(labels))}")
+
+def batch_migrate_to_neo4j(uri, user, password, batch_size=DEFAULT_BATCH_SIZE, clear=True):
+    """Migrate JSON data to Neo4j using UNWIND batches in explicit write transactions"""
+    driver = GraphDatabase.driver(uri, auth=(user, password))
+    
+    try:
+        onto_data, lib_data = load_json_data()
+        total_start = time.perf_counter()
+        node_rows = collect_nodes(onto_data, lib_data)
+        node_groups = group_nodes(node_rows.values())
+        
+        with driver.session() as session:
+            if clear:
+                print("Clearing existing data...")
+                clear_database(session, batch_size)
+            
+            print("Bootstrapping schema...")
+            ensure_schema(session, node_groups.keys())
+            
+            print("Upserting nodes...")
+            upsert_nodes(session, node_groups, batch_size)
+            
+            print("Merging relationships...")
+            labels_by_id = {node_id: row["label"] for node_id, row in node_rows.items()}
+            groups, skipped = group_edges(
+                onto_data.get("edges", []) + lib_data.get("edges", []), labels_by_id
+            )
+            merge_edges(session, groups, batch_size)
+            if skipped:
+                print(f"  Skipped {skipped} edges with a missing or unknown endpoint")
+            
+            print("Updating full-text search index...")
+            ensure_fulltext_index(session, node_groups.keys())
+            
+            print("Migration completed successfully!")
+            
+            node_count = session.run("MATCH (n) RETURN count(n) as count").single()["count"]
+            rel_count = session.run("MATCH ()-[r]->() RETURN count(r) as count").single()["count"]
+            print(f"Graph has {node_count} nodes and {rel_count} relationships "
+                  f"({time.perf_counter() - total_start:.2f}s total)")
+            
+    finally:
+        driver.close()
+
+def fetch_existing_state(session):
+    """Read the ids, labels and hashes currently stored in Neo4j"""
+    nodes = {}
+    for record in session.run(
+        "MATCH (n) WHERE n.id IS NOT NULL "
+        "RETURN n.id AS id, labels(n) AS labels, n.sync_hash AS hash"
+    ):
+        nodes[record["id"]] = {"labels": record["labels"], "hash": record["hash"]}
+    
+    edges = {}
+    for record in session.run(
+        "MATCH (a)-[r]->(b) WHERE r.sync_hash IS NOT NULL "
+        "RETURN r.sync_hash AS hash, a.id AS source, b.id AS target"
+    ):
+        edges[record["hash"]] = {"source": record["source"], "target": record["target"]}
+    return nodes, edges
+
+def first_label(current):
+    """First stored label of an existing node, or None for unlabeled legacy nodes"""
+    labels = (current or {}).get("labels")
+    return labels[0] if labels else None
+
+def label_pattern(label):
+    return f":`{label}`" if label else ""
+
+def relabel_query(stale, label):
+    """Move nodes from their stale labels to `label` in place, keeping relationships"""
+    remove = f"REMOVE n{''.join(label_pattern(old) for old in stale)}" if stale else ""
+    return f"""
+        UNWIND $rows AS row
+        MATCH (n{label_pattern(stale[0] if stale else None)} {{id: row.id}})
+        {remove}
+        SET n:`{label}`, n += row.props
+    """
+
+def diff_graph(node_rows, edge_groups, existing_nodes, existing_edges):
+    """Work out the changeset between the JSON graph and the stored graph.
+
+    Only nodes and relationships carrying a `sync_hash` (i.e. written by this
+    script) are ever deleted, so data loaded by other tools is left alone.
+    A node whose label changed is relabelled in place, keeping its
+    relationships; relabels are grouped by (old labels, new label).
+    """
+    changes = {
+        "node_inserts": [], "node_updates": [], "node_deletes": [], "relabels": {},
+        "edge_inserts": {}, "edge_deletes": {}, "unchanged_nodes": 0, "unchanged_edges": 0
+    }
+    
+    for node_id, row in node_rows.items():
+        current = existing_nodes.get(node_id)
+        if current is None:
+            changes["node_inserts"].append(row)
+        elif current["labels"] != [row["label"]]:
+            stale = tuple(label for label in current["labels"] if label != row["label"])
+            changes["relabels"].setdefault((stale, row["label"]), []).append(row)
+        elif current["hash"] != row["props"]["sync_hash"]:
+            changes["node_updates"].append(row)
+        else:
+            changes["unchanged_nodes"] += 1
+    
+    for node_id, current in existing_nodes.items():
+        if node_id not in node_rows and current["hash"] is not None:
+            changes["node_deletes"].append({"id": node_id, "label": first_label(current)})
+    
+    dropped = {row["id"] for row in changes["node_deletes"]}
+    wanted = set()
+    for key, rows in edge_groups.items():
+        for row in rows:
+            wanted.add(row["hash"])
+            current = existing_edges.get(row["hash"])
+            if current is None or current["source"] in dropped or current["target"] in dropped:
+                changes["edge_inserts"].setdefault(key, []).append(row)
+            else:
+                changes["unchanged_edges"] += 1
+    
+    for edge_hash, current in existing_edges.items():
+        if edge_hash not in wanted and current["source"] not in dropped and current["target"] not in dropped:
+            label = first_label(existing_nodes.get(current["source"]))
+            changes["edge_deletes"].setdefault(label, []).append(
+                {"source": current["source"], "hash": edge_hash}
+            )
+    return changes
+
+def print_changeset(changes):
+    """Print a one-screen summary of a sync changeset"""
+    edge_inserts = sum(len(rows) for rows in changes["edge_inserts"].values())
+    edge_deletes = sum(len(rows) for rows in changes["edge_deletes"].values())
+    print("Changeset:")
+    print(f"  nodes: +{len(changes['node_inserts'])} inserted, "
+          f"~{len(changes['node_updates'])} updated, "
+          f"{sum(len(rows) for rows in changes['relabels'].values())} relabelled, "
+          f"-{len(changes['node_deletes'])} deleted, "
+          f"{changes['unchanged_nodes']} unchanged")
+    print(f"  relationships: +{edge_inserts} inserted, "
+          f"-{edge_deletes} deleted, "
+          f"{changes['unchanged_edges']} unchanged")
+
+def sync_to_neo4j(uri, user, password, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """Apply only the differences between the JSON files and Neo4j, without clearing"""
+    driver = GraphDatabase.driver(uri, auth=(user, password))
+    
+    try:
+        onto_data, lib_data = load_json_data()
+        total_start = time.perf_counter()
+        node_rows = collect_nodes(onto_data, lib_data)
+        labels_by_id = {node_id: row["label"] for node_id, row in node_rows.items()}
+        edge_groups, skipped = group_edges(
+            onto_data.get("edges", []) + lib_data.get("edges", []), labels_by_id
+        )
+        
+        with driver.session() as session:
+            print("Reading current graph state...")
+            existing_nodes, existing_edges = fetch_existing_state(session)
+            changes = diff_graph(node_rows, edge_groups, existing_nodes, existing_edges)
+            print_changeset(changes)
+            if skipped:
+                print(f"  Skipped {skipped} edges with a missing or unknown endpoint")
+            if dry_run:
+                print("Dry run - no changes applied")
+                return changes
+            
+            print("Bootstrapping schema...")
+            ensure_schema(session, group_nodes(node_rows.values()).keys())
+            
+            # Deletes look nodes up by their *current* label so the id
+            # constraint index is used, then upserts and edge merges follow.
+            print("Applying changes...")
+            for label, rows in changes["edge_deletes"].items():
+                run_batched(session, f"relationship deletes from :{label or '(unlabeled)'}", f"""
+                    UNWIND $rows AS row
+                    MATCH (a{label_pattern(label)} {{id: row.source}})-[r]->()
+                    WHERE r.sync_hash = row.hash
+                    DELETE r
+                """, rows, batch_size)
+            for label, rows in group_nodes(changes["node_deletes"]).items():
+                run_batched(session, f"node deletes :{label or '(unlabeled)'}", f"""
+                    UNWIND $rows AS row
+                    MATCH (n{label_pattern(label)} {{id: row.id}})
+                    DETACH DELETE n
+                """, rows, batch_size)
+            for (stale, label), rows in changes["relabels"].items():
+                run_batched(session, f"relabel :{':'.join(stale) or '(unlabeled)'} -> :{label}",
+                            relabel_query(stale, label), rows, batch_size)
+            upsert_nodes(session, group_nodes(
+                changes["node_inserts"] + changes["node_updates"]
+            ), batch_size)
+            merge_edges(session, changes["edge_inserts"], batch_size)
+            
+            print("Updating full-text search index...")
+            ensure_fulltext_index(session, set(labels_by_id.values()))
+            
+            print(f"Sync completed in {time.perf_counter() - total_start:.2f}s")
+            return changes
+            
+    finally:
+        driver.close()
+
+def iter_graph_items(path, section):
+    """Yield the items of one section ("nodes" or "edges") of a graph file.
+
+    `.ndjson`/`.jsonl` files hold one object per line; edges are the objects
+    with a `source` key (or `"kind": "edge"`). `.json` files are parsed
+    incrementally when ijson is installed, otherwise loaded in one go.
+    """
+    if path.endswith((".ndjson", ".jsonl")):
+        with open(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                item = json.loads(line)
+                kind = item.get("kind") or ("edge" if "source" in item else "node")
+                if kind + "s" == section:
+                    yield item
+    elif ijson is not None:
+        with open(path, "rb") as f:
+            yield from ijson.items(f, f"{section}.item", use_float=True)
+    else:
+        with open(path, "r") as f:
+            yield from json.load(f).get(section, [])
+
+def partition_of(node_id, partitions):
+    """Stable partition for an endpoint id"""
+    return zlib.crc32(str(node_id).encode("utf-8")) % partitions
+
+def edge_bucket(edge, partitions):
+    """Unordered pair of endpoint partitions; an edge write locks both endpoints"""
+    return tuple(sorted((partition_of(edge["source"], partitions),
+                         partition_of(edge["target"], partitions))))
+
+def pair_rounds(partitions):
+    """Rounds of partition pairs in which no partition appears twice.
+
+    The first round holds every (p, p) pair; each later round is one perfect
+    matching from the round-robin circle method, so across all rounds every
+    pair of partitions comes up exactly once and batches running in the same
+    round never touch the same nodes.
+    """
+    rounds = [[(p, p) for p in range(partitions)]]
+    ring = list(range(partitions)) + ([None] if partitions % 2 else [])
+    size = len(ring)
+    for _ in range(size - 1):
+        pairs = [(ring[i], ring[size - 1 - i]) for i in range(size // 2)]
+        rounds.append([tuple(sorted(pair)) for pair in pairs if None not in pair])
+        ring = [ring[0], ring[-1]] + ring[1:-1]
+    return rounds
+
+class WriterPool:
+    """A fixed set of single-threaded lanes, each writing through its own session.
+
+    Work for the same lane runs strictly in order. The number of batches in
+    flight is capped, which bounds memory while the input is streamed. Writes
+    go through execute_write, so a transaction that still hits a deadlock
+    (e.g. with another client writing the same nodes) is retried by the
+    driver for up to INGEST_RETRY_SECONDS before the ingest fails.
+    """
+    
+    def __init__(self, driver, lanes, max_pending=None):
+        self.driver = driver
+        self.lanes = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"ingest-{i}")
+            for i in range(lanes)
+        ]
+        self.max_pending = max_pending or lanes * 2
+        self.pending = set()
+        self.rows = 0
+        self._local = threading.local()
+    
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self.driver.session()
+        return session
+    
+    def _write(self, query, rows):
+        self._session().execute_write(_write_batch, query, rows)
+        return len(rows)
+    
+    def _close_session(self):
+        session = getattr(self._local, "session", None)
+        if session is not None:
+            session.close()
+            self._local.session = None
+    
+    def _collect(self, return_when):
+        done, not_done = wait(self.pending, return_when=return_when)
+        self.pending = not_done
+        for future in done:
+            self.rows += future.result()
+    
+    def submit(self, lane, query, rows):
+        while len(self.pending) >= self.max_pending:
+            self._collect(FIRST_COMPLETED)
+        self.pending.add(self.lanes[lane % len(self.lanes)].submit(self._write, query, rows))
+    
+    def join(self):
+        """Wait for every submitted batch; returns rows written since the last join"""
+        if self.pending:
+            self._collect(ALL_COMPLETED)
+        rows, self.rows = self.rows, 0
+        return rows
+    
+    def close(self):
+        for lane in self.lanes:
+            lane.submit(self._close_session).result()
+            lane.shutdown()
+
+def write_edge_wave(pool, buckets, rounds):
+    """Write (and empty) the buffered edge batches round by round; returns rows written"""
+    written = 0
+    for pairs in rounds:
+        for lane, pair in enumerate(pairs):
+            for query, rows in buckets.pop(pair, []):
+                pool.submit(lane, query, rows)
+        written += pool.join()
+    return written
+
+def parallel_ingest_to_neo4j(uri, user, password, paths=None, batch_size=DEFAULT_BATCH_SIZE,
+                             workers=DEFAULT_WORKERS, clear=True):
+    """Stream graph files into Neo4j through a pool of writer sessions.
+
+    Nodes are read first (keeping only an id -> label map in memory) and
+    spread round-robin over the lanes. Edges are then streamed, grouped by
+    relationship type and endpoint labels, and bucketed by the pair of
+    partitions their source and target fall in (2 * workers partitions).
+    Buffered edges are written in waves of pair_rounds: within a round each
+    partition appears in at most one bucket, so concurrent batches never lock
+    the same endpoint; rounds are separated by a barrier. Deadlocks with other
+    writers are left to the driver's transaction retries.
+    """
+    paths = paths or default_graph_files()
+    whole = [path for path in paths if not path.endswith((".ndjson", ".jsonl"))]
+    if whole and ijson is None:
+        print("WARNING: ijson is not installed, so each .json input is loaded whole - twice, once "
+              "for nodes and once for edges - and memory use is not bounded. "
+              "Run `pip install ijson` or convert the inputs to NDJSON: " + ", ".join(whole))
+    driver = GraphDatabase.driver(uri, auth=(user, password),
+                                  max_connection_pool_size=workers + 2,
+                                  max_transaction_retry_time=INGEST_RETRY_SECONDS)
+    pool = WriterPool(driver, workers)
+    
+    try:
+        total_start = time.perf_counter()
+        with driver.session() as session:
+            if clear:
+                print("Clearing existing data...")
+                clear_database(session, batch_size)
+            
+            print(f"Streaming nodes from {len(paths)} file(s) with {workers} workers...")
+            start = time.perf_counter()
+            labels_by_id = {}
+            buffers = {}
+            lane = 0
+            for path in paths:
+                for node in iter_graph_items(path, "nodes"):
+                    row = node_row(node)
+                    # First file wins on duplicate ids, as in collect_nodes
+                    if not row["id"] or row["id"] in labels_by_id:
+                        continue
+                    label = row["label"]
+                    if label not in buffers:
+                        ensure_schema(session, [label])
+                        buffers[label] = []
+                    labels_by_id[row["id"]] = label
+                    buffers[label].append(row)
+                    if len(buffers[label]) >= batch_size:
+                        pool.submit(lane, node_upsert_query(label), buffers[label])
+                        buffers[label] = []
+                        lane += 1
+            for label, rows in buffers.items():
+                if rows:
+                    pool.submit(lane, node_upsert_query(label), rows)
+                    lane += 1
+            report_rate("nodes", pool.join(), time.perf_counter() - start)
+        
+        print("Streaming relationships...")
+        start = time.perf_counter()
+        partitions = 2 * workers
+        rounds = pair_rounds(partitions)
+        wave_rows = batch_size * partitions * workers
+        buffers = {}
+        buckets = {}
+        buffered = 0
+        written = 0
+        skipped = 0
+        for path in paths:
+            for edge in iter_graph_items(path, "edges"):
+                source_label = labels_by_id.get(edge.get("source"))
+                target_label = labels_by_id.get(edge.get("target"))
+                if not source_label or not target_label:
+                    skipped += 1
+                    continue
+                rel_type = rel_type_for(edge)
+                key = (rel_type, source_label, target_label, edge_bucket(edge, partitions))
+                rows = buffers.setdefault(key, [])
+                rows.append(edge_row(edge, rel_type))
+                if len(rows) >= batch_size:
+                    buckets.setdefault(key[3], []).append((edge_merge_query(*key[:3]), rows))
+                    buffers[key] = []
+                    buffered += len(rows)
+                    if buffered >= wave_rows:
+                        written += write_edge_wave(pool, buckets, rounds)
+                        buffered = 0
+        for key, rows in buffers.items():
+            if rows:
+                buckets.setdefault(key[3], []).append((edge_merge_query(*key[:3]), rows))
+        written += write_edge_wave(pool, buckets, rounds)
+        report_rate("relationships", written, time.perf_counter() - start)
+        if skipped:
+            print(f"  Skipped {skipped} edges with a missing or unknown endpoint")
+        
+        print("Updating full-text search index...")
+        with driver.session() as session:
+            ensure_fulltext_index(session, set(labels_by_id.values()))
+        
+        print(f"Ingest completed in {time.perf_counter() - total_start:.2f}s")
+        
+    finally:
+        pool.close()
+        driver.close()
+
 if __name__ == "__main__":
-    # Configuration - update these values
-    NEO4J_URI = "bolt://localhost:7687"
-    NEO4J_USER = "neo4j"
-    NEO4J_PASSWORD = "password"  # Change this to your Neo4j password
+    parser = argparse.ArgumentParser(description="Import ontology/library JSON into Neo4j")
+    parser.add_argument("--mode", choices=["legacy", "batch", "sync", "parallel"], default="batch",
+                        help="batch: full reload in UNWIND chunks; sync: apply only the diff "
+                             "against the current graph; parallel: stream files through "
+                             "several writer sessions; legacy: one query per row")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="rows per UNWIND transaction in batch mode")
+    parser.add_argument("--keep-existing", action="store_true",
+                        help="batch/parallel mode: upsert over the existing graph instead of clearing it")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="parallel mode: number of writer sessions")
+    parser.add_argument("--input", nargs="+", metavar="FILE",
+                        help="parallel mode: graph files (.json or .ndjson) to ingest, in order")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="sync mode: print the changeset without applying it")
+    args = parser.parse_args()
+    
+    # Configuration - set NEO4J_* environment variables or update these defaults
+    NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+    NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+    NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
     
     print("Starting migration from JSON to Neo4j...")
     print(f"Connecting to {NEO4J_URI} as {NEO4J_USER}")
     
     try:
-        migrate_to_neo4j(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+        if args.mode == "legacy":
+            migrate_to_neo4j(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+        elif args.mode == "parallel":
+            parallel_ingest_to_neo4j(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+                                     paths=args.input, batch_size=args.batch_size,
+                                     workers=args.workers, clear=not args.keep_existing)
+        elif args.mode == "sync":
+            sync_to_neo4j(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+                          batch_size=args.batch_size, dry_run=args.dry_run)
+        else:
+            batch_migrate_to_neo4j(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+                                   batch_size=args.batch_size,
+                                   clear=not args.keep_existing)
     except Exception as e:
         print(f"Migration failed: {e}")
-        print("Make sure Neo4j is running and credentials are correct")
\ No newline at end of file
+        print("Make sure Neo4j is running and credentials are correct")
+    finally:
+        # Viewers cache query results; make them re-read the (possibly partly) migrated graph
+        if not (args.mode == "sync" and args.dry_run):
+            invalidate_query_cache()
+
@@ -1,55 +1,180 @@
-from neo4j import GraphDatabase
+import asyncio
+import os
+import threading
+import time
+from neo4j import AsyncGraphDatabase, GraphDatabase, READ_ACCESS
 import streamlit as st
+from graph_converter import first_of, result_to_graph
+
+# Driver tuning; one client (and pool) is shared by every Streamlit session
+POOL_SIZE = int(os.getenv("NEO4J_POOL_SIZE", "50"))
+ACQUIRE_TIMEOUT = float(os.getenv("NEO4J_ACQUIRE_TIMEOUT", "30"))
+FETCH_SIZE = int(os.getenv("NEO4J_FETCH_SIZE", "1000"))
+MAX_RETRY_TIME = float(os.getenv("NEO4J_MAX_RETRY_TIME", "15"))
+ONTOLOGY_PAGE_SIZE = int(os.getenv("ONTOLOGY_PAGE_SIZE", "100"))
+ONTOLOGY_EDGE_LIMIT = int(os.getenv("ONTOLOGY_EDGE_LIMIT", "500"))
 
 class Neo4jClient:
-    def __init__(self, uri, user, password):
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+    def __init__(self, uri, user, password, pool_size=POOL_SIZE, acquire_timeout=ACQUIRE_TIMEOUT,
+                 fetch_size=FETCH_SIZE, max_retry_time=MAX_RETRY_TIME, database=None):
+        self.driver = GraphDatabase.driver(
+            uri, auth=(user, password),
+            max_connection_pool_size=pool_size,
+            connection_acquisition_timeout=acquire_timeout,
+            max_transaction_retry_time=max_retry_time,
+            keep_alive=True
+        )
+        self._init_stats(pool_size, fetch_size, database)
+    
+    def _init_stats(self, pool_size, fetch_size, database):
+        self.pool_size = pool_size
+        self.fetch_size = fetch_size
+        self.database = database
+        self._stats_lock = threading.Lock()
+        self._stats = {"reads": 0, "retries": 0, "failures": 0, "in_use": 0, "peak_in_use": 0,
+                       "wait_seconds": 0.0, "read_seconds": 0.0}
     
     def close(self):
         self.driver.close()
     
-    def get_ontology_data(self, categories=None, search=""):
-        query = """
+    def _bump(self, **deltas):
+        with self._stats_lock:
+            for key, delta in deltas.items():
+                self._stats[key] += delta
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self._stats["in_use"])
+    
+    def _read(self, work, query, params):
+        """Managed read transaction: routed to readers, retried on transient errors.
+        work(result) must consume the result inside the transaction."""
+        started = time.perf_counter()
+        first_attempt = []
+        
+        def unit(tx):
+            if first_attempt:
+                self._bump(retries=1)
+            else:
+                # Time to the first attempt covers waiting for a pooled connection
+                first_attempt.append(time.perf_counter())
+            return work(tx.run(query, **params))
+        
+        self._bump(in_use=1)
+        try:
+            with self.driver.session(database=self.database, fetch_size=self.fetch_size,
+                                     default_access_mode=READ_ACCESS) as session:
+                return session.execute_read(unit)
+        except Exception:
+            self._bump(failures=1)
+            raise
+        finally:
+            finished = time.perf_counter()
+            waited = (first_attempt[0] if first_attempt else finished) - started
+            self._bump(in_use=-1, reads=1, wait_seconds=waited, read_seconds=finished - started)
+    
+    def pool_stats(self):
+        """Read counters and utilization of this client's connection pool"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        reads = stats["reads"] or 1
+        return {
+            "pool_size": self.pool_size,
+            "in_use": stats["in_use"],
+            "peak_in_use": stats["peak_in_use"],
+            "utilization": round(stats["in_use"] / self.pool_size, 3),
+            "reads": stats["reads"],
+            "retries": stats["retries"],
+            "failures": stats["failures"],
+            "avg_wait_ms": round(stats["wait_seconds"] / reads * 1000, 1),
+            "avg_read_ms": round(stats["read_seconds"] / reads * 1000, 1)
+        }
+    
+    @staticmethod
+    def _node_payload(node_id, labels, props, size=20):
+        return {
+            "id": node_id,
+            "label": first_of(props, ("name", "label"), node_id),
+            "type": labels[0] if labels else "Unknown",
+            "desc": first_of(props, ("description", "desc"), ""),
+            "size": size,
+            "shape": "dot",
+            "color": "#888"
+        }
+    
+    @staticmethod
+    def _edge_payload(rel_id, rel_type, source, target, props):
+        return {"source": source, "target": target, "label": rel_type}
+    
+    # Each query is described once as (work, query, params) and run by the sync or async client
+    def _ontology_request(self, categories=None, search="", cursor=None, page_size=ONTOLOGY_PAGE_SIZE):
+        # Keyset page over the migrated `id`; nodes without an `id` are not paged.
+        # Without categories this is a scan of every node plus a sort. With
+        # categories each label gets its own labelled branch, which the per-label
+        # id constraint index can serve in id order. Nodes and edges come back as
+        # separate, already deduplicated projections
+        filters = "n.id IS NOT NULL" if cursor is None else "n.id > $cursor"
+        filters += """
+          AND ($search = '' OR any(text IN [n.name, n.label, n.description, n.desc]
+                                   WHERE toLower(toString(text)) CONTAINS $search))"""
+        if categories:
+            branches = "\n            UNION\n".join(
+                f"""            MATCH (n:`{label.replace('`', '``')}`)
+            WHERE {filters}
+            RETURN n ORDER BY n.id LIMIT $page_size"""
+                for label in sorted(set(categories))
+            )
+            page_match = f"""
+        CALL {{
+{branches}
+        }}
+        WITH n ORDER BY n.id LIMIT $page_size"""
+        else:
+            page_match = f"""
         MATCH (n)
-        OPTIONAL MATCH (n)-[r]->(m)
-        RETURN n, r, m
-        LIMIT 100
+        WHERE {filters}
+        WITH n ORDER BY n.id LIMIT $page_size"""
+        query = page_match + """
+        WITH collect(n) AS page, max(n.id) AS last_key
+        CALL {
+            WITH page
+            UNWIND page AS n
+            MATCH (n)-[r]->(m)
+            WITH r, m LIMIT $edge_limit
+            RETURN collect(r) AS rels, collect(DISTINCT m) AS ends
+        }
+        RETURN [x IN page + [m IN ends WHERE NOT m IN page] |
+                   {id: elementId(x), labels: labels(x), name: coalesce(x.name, x.label),
+                    description: coalesce(x.description, x.desc)}] AS nodes,
+               [r IN rels | {source: elementId(startNode(r)), target: elementId(endNode(r)), type: type(r)}] AS edges,
+               last_key, size(page) AS page_count
         """
+        params = {
+            "search": (search or "").strip().lower(),
+            "cursor": cursor,
+            "page_size": page_size,
+            "edge_limit": ONTOLOGY_EDGE_LIMIT
+        }
         
-        with self.driver.session() as session:
-            result = session.run(query)
-            
-            nodes = {}
-            edges = []
-            
-            for record in result:
-                node = record["n"]
-                if node:
-                    nodes[node.element_id] = {
-                        "id": node.element_id,
-                        "label": node.get("name", node.get("label", node.element_id)),
-                        "type": list(node.labels)[0] if node.labels else "Unknown",
-                        "desc": node.get("description", node.get("desc", "")),
-                        "size": 20,
-                        "shape": "dot",
-                        "color": "#888"
-                    }
-                
-                rel = record["r"]
-                target = record["m"]
-                if rel and target:
-                    edges.append({
-                        "source": node.element_id,
-                        "target": target.element_id,
-                        "label": rel.type
-                    })
-            
-            return {"nodes": list(nodes.values()), "edges": edges}
-    
-    def get_library_data(self, focus_id=None, use_case="Everything"):
-        if not focus_id:
-            return {"nodes": [], "edges": []}
+        def collect(result):
+            records = list(result)
+            if not records:
+                return {"nodes": [], "edges": [], "next_cursor": None}
+            record = records[0]
+            return {
+                "nodes": [
+                    self._node_payload(node["id"], node["labels"],
+                                       {"name": node["name"], "description": node["description"]})
+                    for node in record["nodes"]
+                ],
+                "edges": [
+                    self._edge_payload(None, edge["type"], edge["source"], edge["target"], {})
+                    for edge in record["edges"]
+                ],
+                # Another page exists only if this one was full
+                "next_cursor": record["last_key"] if record["page_count"] == page_size else None
+            }
         
+        return collect, query, params
+    
+    def _library_request(self, focus_id, use_case="Everything"):
         query = """
         MATCH (focus)-[r]-(connected)
         WHERE elementId(focus) = $focus_id
@@ -57,58 +182,148 @@ class Neo4jClient:
         LIMIT 50
         """
         
-        with self.driver.session() as session:
-            result = session.run(query, focus_id=focus_id)
-            
-            nodes = {}
-            edges = []
-            
-            for record in result:
-                for node_key in ["focus", "connected"]:
-                    node = record[node_key]
-                    if node and node.element_id not in nodes:
-                        nodes[node.element_id] = {
-                            "id": node.element_id,
-                            "label": node.get("name", node.get("label", node.element_id)),
-                            "type": list(node.labels)[0] if node.labels else "Unknown",
-                            "desc": node.get("description", node.get("desc", "")),
-                            "size": 30 if node.element_id == focus_id else 20,
-                            "shape": "dot",
-                            "color": "#888"
-                        }
-                
-                rel = record["r"]
-                if rel:
-                    edges.append({
-                        "source": record["focus"].element_id,
-                        "target": record["connected"].element_id,
-                        "label": rel.type
-                    })
-            
-            return {"nodes": list(nodes.values()), "edges": edges}
+        def node_payload(node_id, labels, props):
+            return self._node_payload(node_id, labels, props, 30 if node_id == focus_id else 20)
+        
+        return lambda result: result_to_graph(result, node_payload, self._edge_payload), query, {"focus_id": focus_id}
     
-    def get_all_categories(self):
+    def _categories_request(self):
         query = "MATCH (n) RETURN DISTINCT labels(n) as labels LIMIT 20"
-        with self.driver.session() as session:
-            result = session.run(query)
+        def collect(result):
             categories = []
             for record in result:
                 labels = record["labels"]
                 if labels:
                     categories.extend(labels)
             return list(set(categories))
+        
+        return collect, query, {}
     
-    def get_publications(self):
+    def _publications_request(self):
         query = "MATCH (n) RETURN elementId(n) as id, coalesce(n.name, n.label, elementId(n)) as label LIMIT 20"
-        with self.driver.session() as session:
-            result = session.run(query)
-            return [(record["id"], record["label"]) for record in result]
+        return lambda result: [(record["id"], record["label"]) for record in result], query, {}
     
-    def get_topics(self):
+    def _topics_request(self):
         query = "MATCH (n) RETURN elementId(n) as id, coalesce(n.name, n.label, elementId(n)) as label LIMIT 20"
-        with self.driver.session() as session:
-            result = session.run(query)
-            return [(record["id"], record["label"]) for record in result]
+        return lambda result: [(record["id"], record["label"]) for record in result], query, {}
+    
+    def get_ontology_data(self, categories=None, search="", cursor=None, page_size=ONTOLOGY_PAGE_SIZE):
+        """One page of nodes matching the categories/search, their outgoing edges, and next_cursor"""
+        return self._read(*self._ontology_request(categories, search, cursor, page_size))
+    
+    def get_library_data(self, focus_id=None, use_case="Everything"):
+        if not focus_id:
+            return {"nodes": [], "edges": []}
+        return self._read(*self._library_request(focus_id, use_case))
+    
+    def get_all_categories(self):
+        return self._read(*self._categories_request())
+    
+    def get_publications(self):
+        return self._read(*self._publications_request())
+    
+    def get_topics(self):
+        return self._read(*self._topics_request())
+
+class AsyncNeo4jClient(Neo4jClient):
+    """Same queries and API as Neo4jClient, as coroutines on the neo4j async driver.
+    Use it from a single event loop (see PageLoader for calling it from Streamlit)."""
+    
+    def __init__(self, uri, user, password, pool_size=POOL_SIZE, acquire_timeout=ACQUIRE_TIMEOUT,
+                 fetch_size=FETCH_SIZE, max_retry_time=MAX_RETRY_TIME, database=None):
+        self.driver = AsyncGraphDatabase.driver(
+            uri, auth=(user, password),
+            max_connection_pool_size=pool_size,
+            connection_acquisition_timeout=acquire_timeout,
+            max_transaction_retry_time=max_retry_time,
+            keep_alive=True
+        )
+        self._init_stats(pool_size, fetch_size, database)
+    
+    async def close(self):
+        await self.driver.close()
+    
+    async def _read(self, work, query, params):
+        started = time.perf_counter()
+        first_attempt = []
+        
+        async def unit(tx):
+            if first_attempt:
+                self._bump(retries=1)
+            else:
+                first_attempt.append(time.perf_counter())
+            result = await tx.run(query, **params)
+            return work([record async for record in result])
+        
+        self._bump(in_use=1)
+        try:
+            async with self.driver.session(database=self.database, fetch_size=self.fetch_size,
+                                           default_access_mode=READ_ACCESS) as session:
+                return await session.execute_read(unit)
+        except Exception:
+            self._bump(failures=1)
+            raise
+        finally:
+            finished = time.perf_counter()
+            waited = (first_attempt[0] if first_attempt else finished) - started
+            self._bump(in_use=-1, reads=1, wait_seconds=waited, read_seconds=finished - started)
+    
+    async def get_ontology_data(self, categories=None, search="", cursor=None, page_size=ONTOLOGY_PAGE_SIZE):
+        return await self._read(*self._ontology_request(categories, search, cursor, page_size))
+    
+    async def get_library_data(self, focus_id=None, use_case="Everything"):
+        if not focus_id:
+            return {"nodes": [], "edges": []}
+        return await self._read(*self._library_request(focus_id, use_case))
+    
+    async def get_all_categories(self):
+        return await self._read(*self._categories_request())
+    
+    async def get_publications(self):
+        return await self._read(*self._publications_request())
+    
+    async def get_topics(self):
+        return await self._read(*self._topics_request())
+
+class PageLoader:
+    """Runs an AsyncNeo4jClient on a background event loop so synchronous Streamlit
+    code can fire the independent page-load queries together and wait for the slowest"""
+    
+    def __init__(self, uri, user, password, **client_options):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="neo4j-page-loader", daemon=True)
+        self._thread.start()
+        
+        async def make_client():
+            # Created on the loop it will be used from
+            return AsyncNeo4jClient(uri, user, password, **client_options)
+        
+        self.client = self.run(make_client())
+    
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+    
+    def load_page(self, categories=None, search="", focus_id=None, use_case="Everything", cursor=None):
+        """categories, publications, topics, ontology (and library for a focus node), fetched concurrently"""
+        async def gather():
+            names = ["categories", "publications", "topics", "ontology", "library"]
+            results = await asyncio.gather(
+                self.client.get_all_categories(),
+                self.client.get_publications(),
+                self.client.get_topics(),
+                self.client.get_ontology_data(categories, search, cursor),
+                self.client.get_library_data(focus_id, use_case)
+            )
+            return dict(zip(names, results))
+        
+        return self.run(gather())
+    
+    def pool_stats(self):
+        return self.client.pool_stats()
+    
+    def close(self):
+        self.run(self.client.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
 
 @st.cache_resource
 def get_neo4j_client():
@@ -119,6 +334,16 @@ def get_neo4j_client():
         password = st.secrets["NEO4J_PASSWORD"]
         st.write(f"Connecting to: {uri}")  # Debug info
         return Neo4jClient(uri, user, password)
+    except Exception as e:
+        st.error(f"Failed to connect to Neo4j: {e}")
+        st.error("Check your secrets configuration")
+        st.stop()
+
+@st.cache_resource
+def get_page_loader():
+    # Async client for concurrent page loads; same secrets as get_neo4j_client
+    try:
+        return PageLoader(st.secrets["NEO4J_URI"], st.secrets["NEO4J_USERNAME"], st.secrets["NEO4J_PASSWORD"])
     except Exception as e:
         st.error(f"Failed to connect to Neo4j: {e}")
         st.error("Check your secrets configuration")
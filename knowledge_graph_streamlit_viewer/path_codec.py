@@ -0,0 +1,210 @@
+"""
+Compact path payloads for the embeddable graph viewers.
+
+Kept identical in knowledge_graph_streamlit_viewer/, vertex_cx_chatbot/ and
+bimei-vertex-cx-chatbot/ (each is deployed on its own); keep them in sync.
+
+Instead of ?paths=<URL-quoted JSON>, a viewer URL can carry
+    ?p=<base64url( version byte + zlib( compact JSON ) )>
+where the version 1 body is positional arrays with dictionary-coded strings:
+    [types, rel_types, nodes, paths]
+    types     = ["DictionaryItem", ...]            node types, each stored once
+    rel_types = ["RELATES_TO", ...]                relationship types, stored once
+    nodes     = [[id, label, type_index], ...]     every distinct node once
+    paths     = [[[node_index, ...], [rel_type_index, ...], score], ...]
+Very large graphs can be stored server-side and referenced as ?pid=<id>.
+Decoding returns the same list of {"nodes", "rels"} dicts as the JSON format.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import re
+import urllib.request
+import zlib
+
+FORMAT_VERSION = 1
+# Refuse payloads that inflate beyond this, whatever their compressed size
+MAX_PAYLOAD_BYTES = int(os.getenv("PATH_PAYLOAD_MAX_BYTES", str(2 * 1024 * 1024)))
+# Server-side payloads: a shared directory and/or a URL template containing {id}
+PAYLOAD_DIR = os.getenv("PATH_PAYLOAD_DIR", "")
+PAYLOAD_URL = os.getenv("PATH_PAYLOAD_URL", "")
+PAYLOAD_ID = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+class PayloadError(ValueError):
+    pass
+
+
+# Node fields that end up in labels, colours and dict keys
+SCALARS = (str, int, float, bool)
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    text = text.strip()
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def rel_type_of(rel):
+    """Relationship entries are type strings, or {"type": ...} in older payloads"""
+    if isinstance(rel, dict):
+        return str(rel.get("type", "CONNECTED_TO"))
+    return str(rel)
+
+
+def validate_paths(paths):
+    """Check a decoded payload has the path shape; returns the list of path dicts.
+
+    Accepts a list of paths or the {"paths": [...]} wrapper. Each path is a dict
+    whose "nodes" is a list of dicts with a scalar "id" (and scalar "type" and
+    "label" when present) and whose "rels" is a list of type strings or dicts.
+    Raises PayloadError naming the first offending item.
+    """
+    if isinstance(paths, dict):
+        paths = paths.get("paths")
+    if not isinstance(paths, list):
+        raise PayloadError("Payload must be a list of paths")
+    for p, path in enumerate(paths):
+        if not isinstance(path, dict):
+            raise PayloadError(f"Path {p} is not an object")
+        nodes, rels = path.get("nodes", []), path.get("rels", [])
+        if not isinstance(nodes, list) or not isinstance(rels, list):
+            raise PayloadError(f"Path {p}: nodes and rels must be lists")
+        for i, node in enumerate(nodes):
+            if not isinstance(node, dict) or node.get("id") in (None, ""):
+                raise PayloadError(f"Path {p}, node {i}: expected an object with an id")
+            for field in ("id", "type", "label"):
+                if not isinstance(node.get(field, ""), SCALARS):
+                    raise PayloadError(f"Path {p}, node {i}: {field} must be a string or number")
+        for i, rel in enumerate(rels):
+            if not isinstance(rel, (str, dict)):
+                raise PayloadError(f"Path {p}, rel {i}: expected a type string or object")
+    return paths
+
+
+def _pack_v1(paths):
+    types, rel_types, nodes = {}, {}, {}
+    packed_paths = []
+    for path in paths:
+        node_refs = []
+        for node in path.get("nodes", []):
+            node_id = str(node.get("id", ""))
+            if node_id not in nodes:
+                node_type = node.get("type", "Unknown")
+                nodes[node_id] = (len(nodes), [node_id, node.get("label", ""), types.setdefault(node_type, len(types))])
+            node_refs.append(nodes[node_id][0])
+        rel_refs = [rel_types.setdefault(rel_type_of(rel), len(rel_types)) for rel in path.get("rels", [])]
+        score = path.get("score", path.get("score_norm"))
+        packed_paths.append([node_refs, rel_refs, score])
+    return [list(types), list(rel_types), [entry for _, entry in nodes.values()], packed_paths]
+
+
+def _unpack_v1(body):
+    types, rel_types, nodes, packed_paths = body
+    paths = []
+    for node_refs, rel_refs, score in packed_paths:
+        path = {
+            "nodes": [
+                {"id": nodes[i][0], "label": nodes[i][1], "type": types[nodes[i][2]]} for i in node_refs
+            ],
+            "rels": [rel_types[i] for i in rel_refs]
+        }
+        if score is not None:
+            path["score"] = score
+        paths.append(path)
+    return paths
+
+
+# version byte -> decoder; add an entry (never change one) when the format evolves
+DECODERS = {1: _unpack_v1}
+
+
+def encode_paths(paths):
+    """Path dicts (as produced by the GraphQuery tool) -> compact ?p= value"""
+    body = json.dumps(_pack_v1(paths), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return _b64encode(bytes([FORMAT_VERSION]) + zlib.compress(body, 9))
+
+
+def inflate_payload(token):
+    """Compact ?p= value -> (version, JSON body bytes); the decode half of decode_paths"""
+    try:
+        raw = _b64decode(token)
+    except (ValueError, TypeError) as e:
+        raise PayloadError(f"Payload is not base64url: {e}")
+    if not raw:
+        raise PayloadError("Empty payload")
+    if raw[0] not in DECODERS:
+        raise PayloadError(f"Unsupported payload version {raw[0]}")
+    inflater = zlib.decompressobj()
+    try:
+        body = inflater.decompress(raw[1:], MAX_PAYLOAD_BYTES)
+    except zlib.error as e:
+        raise PayloadError(f"Payload is not compressed data: {e}")
+    if inflater.unconsumed_tail:
+        raise PayloadError(f"Payload inflates beyond {MAX_PAYLOAD_BYTES} bytes")
+    return raw[0], body
+
+
+def unpack_payload(version, body):
+    """(version, JSON body bytes) -> list of path dicts; the parse half of decode_paths"""
+    try:
+        return DECODERS[version](json.loads(body.decode("utf-8")))
+    except (ValueError, TypeError, IndexError, KeyError, RecursionError) as e:
+        raise PayloadError(f"Malformed version {version} payload: {e}")
+
+
+def decode_paths(token):
+    """Compact ?p= value -> list of path dicts; raises PayloadError on bad input"""
+    return unpack_payload(*inflate_payload(token))
+
+
+def payload_id(token):
+    """Short content-addressed id for a compact payload"""
+    return _b64encode(hashlib.sha256(token.encode("ascii")).digest()[:12])
+
+
+def store_payload(paths, directory=None):
+    """Write the encoded payload to the shared payload directory; returns its ?pid= id"""
+    directory = directory or PAYLOAD_DIR
+    if not directory:
+        raise PayloadError("PATH_PAYLOAD_DIR is not configured")
+    token = encode_paths(paths)
+    pid = payload_id(token)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, pid), "w", encoding="ascii") as f:
+        f.write(token)
+    return pid
+
+
+def fetch_payload_token(pid):
+    """?pid= id -> compact payload, from PATH_PAYLOAD_DIR or PATH_PAYLOAD_URL"""
+    if not PAYLOAD_ID.match(pid or ""):
+        raise PayloadError("Invalid payload id")
+    token = None
+    if PAYLOAD_DIR:
+        try:
+            with open(os.path.join(PAYLOAD_DIR, pid), encoding="ascii") as f:
+                token = f.read()
+        except FileNotFoundError:
+            pass
+    if token is None and PAYLOAD_URL:
+        try:
+            with urllib.request.urlopen(PAYLOAD_URL.format(id=pid), timeout=10) as response:
+                token = response.read(MAX_PAYLOAD_BYTES + 1).decode("ascii")
+        except Exception as e:
+            raise PayloadError(f"Could not fetch payload {pid}: {e}")
+    if token is None:
+        raise PayloadError(f"Unknown payload id {pid}")
+    if payload_id(token.strip()) != pid:
+        raise PayloadError(f"Payload {pid} does not match its id")
+    return token
+
+
+def load_payload(pid):
+    """?pid= id -> list of path dicts"""
+    return decode_paths(fetch_payload_token(pid))
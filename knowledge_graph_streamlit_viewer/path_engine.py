@@ -0,0 +1,211 @@
+"""
+In-process weighted path engine.
+Loads the graph topology once into compact CSR adjacency arrays, costs
+each hop from the relationship weights file and answers best / k-best
+path queries between candidate node sets without a database round trip
+or APOC.
+"""
+
+import heapq
+import math
+from array import array
+
+# Per-hop penalty; matches defaults.hop_decay_lambda (-ln hop_decay) in weights-v1.json
+DEFAULT_HOP_PENALTY = 0.35
+DEFAULT_EDGE_WEIGHT = 0.5
+MIN_WEIGHT = 1e-6
+
+TOPOLOGY_QUERY = """
+MATCH (a)-[r]->(b)
+WHERE NOT 'Chunk' IN labels(a) AND NOT 'Chunk' IN labels(b)
+RETURN elementId(a) AS source, elementId(b) AS target, type(r) AS type, elementId(r) AS id
+"""
+
+_START = -1  # virtual node in front of every path: "any source"
+
+
+def edge_cost(weight, hop_penalty=DEFAULT_HOP_PENALTY):
+    """Cost of one hop: -ln(weight) + hop penalty, so the cheapest path has the highest weight product"""
+    return -math.log(min(1.0, max(MIN_WEIGHT, weight))) + hop_penalty
+
+
+class PathEngine:
+    """Undirected CSR snapshot of the graph with one cost per relationship"""
+
+    def __init__(self, edges, weights, default_weight=DEFAULT_EDGE_WEIGHT, hop_penalty=DEFAULT_HOP_PENALTY):
+        """`edges` yields (source_id, target_id, rel_type, rel_id); `weights` maps rel_type -> weight"""
+        self.node_ids = []
+        self.node_index = {}
+        self.rel_ids = []
+        self.rel_types = []
+        self._type_index = {}
+        self.rel_type = array('i')
+        self.rel_cost = array('d')
+        sources = array('i')
+        targets = array('i')
+
+        for source_id, target_id, rel_type, rel_id in edges:
+            sources.append(self._intern_node(source_id))
+            targets.append(self._intern_node(target_id))
+            self.rel_ids.append(rel_id)
+            type_position = self._type_index.get(rel_type)
+            if type_position is None:
+                type_position = self._type_index[rel_type] = len(self.rel_types)
+                self.rel_types.append(rel_type)
+            self.rel_type.append(type_position)
+            self.rel_cost.append(edge_cost(weights.get(rel_type, default_weight), hop_penalty))
+
+        # CSR: neighbours of node i are adj_node[offsets[i]:offsets[i + 1]],
+        # reached through relationship adj_rel[...] (both directions stored)
+        degree = array('i', [0]) * (len(self.node_ids) + 1)
+        for source, target in zip(sources, targets):
+            degree[source + 1] += 1
+            degree[target + 1] += 1
+        for i in range(len(self.node_ids)):
+            degree[i + 1] += degree[i]
+        self.offsets = degree
+        cursor = array('i', degree)
+        self.adj_node = array('i', [0]) * (2 * len(sources))
+        self.adj_rel = array('i', [0]) * (2 * len(sources))
+        for rel, (source, target) in enumerate(zip(sources, targets)):
+            for here, there in ((source, target), (target, source)):
+                slot = cursor[here]
+                self.adj_node[slot] = there
+                self.adj_rel[slot] = rel
+                cursor[here] += 1
+
+    def _intern_node(self, node_id):
+        position = self.node_index.get(node_id)
+        if position is None:
+            position = self.node_index[node_id] = len(self.node_ids)
+            self.node_ids.append(node_id)
+        return position
+
+    @classmethod
+    def from_session(cls, session, weights, **kwargs):
+        """Load the topology (no properties) with a single streaming query"""
+        result = session.run(TOPOLOGY_QUERY)
+        return cls(
+            ((record["source"], record["target"], record["type"], record["id"]) for record in result),
+            weights, **kwargs
+        )
+
+    def _indices(self, node_ids):
+        return {self.node_index[node_id] for node_id in node_ids if node_id in self.node_index}
+
+    def _dijkstra(self, sources, targets, banned_nodes=(), banned_rels=()):
+        """Multi-source Dijkstra to the cheapest path from a source to a *different* target;
+        returns (cost, nodes, rels) or None.
+
+        Every node keeps its two best labels from distinct origin sources, so a
+        candidate that is both a source and a target is never a zero-hop path
+        on its own but can still be reached from another source.
+        """
+        labels = {}    # node -> {origin: cost}, at most two origins
+        previous = {}  # (node, origin) -> (previous node, rel), None at the origin
+        heap = []
+        for source in sources:
+            if source not in banned_nodes:
+                labels[source] = {source: 0.0}
+                previous[(source, source)] = None
+                heap.append((0.0, source, source))
+        heapq.heapify(heap)
+        offsets, adj_node, adj_rel, rel_cost = self.offsets, self.adj_node, self.adj_rel, self.rel_cost
+
+        while heap:
+            cost, node, origin = heapq.heappop(heap)
+            if labels[node].get(origin) != cost:
+                continue
+            if node in targets and node != origin:
+                nodes, rels = [node], []
+                step = previous[(node, origin)]
+                while step is not None:
+                    node, rel = step
+                    nodes.append(node)
+                    rels.append(rel)
+                    step = previous[(node, origin)]
+                return cost, nodes[::-1], rels[::-1]
+            for slot in range(offsets[node], offsets[node + 1]):
+                rel = adj_rel[slot]
+                neighbour = adj_node[slot]
+                if rel in banned_rels or neighbour in banned_nodes or neighbour == origin:
+                    continue
+                next_cost = cost + rel_cost[rel]
+                held = labels.setdefault(neighbour, {})
+                if origin in held:
+                    if next_cost >= held[origin]:
+                        continue
+                elif len(held) >= 2:
+                    worst = max(held, key=held.get)
+                    if next_cost >= held[worst]:
+                        continue
+                    del held[worst]
+                held[origin] = next_cost
+                previous[(neighbour, origin)] = (node, rel)
+                heapq.heappush(heap, (next_cost, neighbour, origin))
+        return None
+
+    def k_best_paths(self, source_ids, target_ids, k=3):
+        """Yen's k-shortest loopless paths from any source to any target, cheapest first"""
+        sources = self._indices(source_ids)
+        targets = self._indices(target_ids)
+        if not sources or not targets:
+            return []
+
+        first = self._dijkstra(sources, targets)
+        if first is None:
+            return []
+        # Paths are stored with the virtual _START node in front so the
+        # spur at position 0 can re-pick the starting candidate.
+        found = [(first[0], [_START] + first[1], first[2])]
+        candidates = []
+        seen = {tuple(first[2]) + (first[1][0],)}
+
+        # nodes[j] (j >= 1) is joined to nodes[j + 1] by rels[j - 1]
+        while len(found) < k:
+            _, last_nodes, last_rels = found[-1]
+            for i in range(len(last_nodes) - 1):
+                root_nodes = last_nodes[:i + 1]
+                root_rels = last_rels[:max(0, i - 1)]
+                shared = [
+                    (nodes, rels) for _, nodes, rels in found
+                    if nodes[:i + 1] == root_nodes and rels[:len(root_rels)] == root_rels
+                ]
+                if i == 0:
+                    spur_sources = sources - {nodes[1] for nodes, _ in shared}
+                    banned_nodes, banned_rels = set(), set()
+                else:
+                    spur_sources = {last_nodes[i]}
+                    banned_nodes = set(root_nodes[1:i])
+                    banned_rels = {rels[i - 1] for _, rels in shared if len(rels) >= i}
+                result = self._dijkstra(spur_sources, targets, banned_nodes, banned_rels)
+                if result is None:
+                    continue
+                _, spur_nodes, spur_rels = result
+                nodes = root_nodes + spur_nodes[1:] if i else [_START] + spur_nodes
+                rels = root_rels + spur_rels
+                key = tuple(rels) + (nodes[1],)
+                if key in seen:
+                    continue
+                seen.add(key)
+                cost = sum(self.rel_cost[rel] for rel in rels)
+                heapq.heappush(candidates, (cost, len(seen), nodes, rels))
+            if not candidates:
+                break
+            cost, _, nodes, rels = heapq.heappop(candidates)
+            found.append((cost, nodes, rels))
+
+        return [self._describe(cost, nodes[1:], rels) for cost, nodes, rels in found]
+
+    def best_path(self, source_ids, target_ids):
+        paths = self.k_best_paths(source_ids, target_ids, k=1)
+        return paths[0] if paths else None
+
+    def _describe(self, cost, nodes, rels):
+        return {
+            'nodes': [self.node_ids[node] for node in nodes],
+            'rels': [self.rel_ids[rel] for rel in rels],
+            'types': [self.rel_types[self.rel_type[rel]] for rel in rels],
+            'cost': cost,
+            'score': math.exp(-cost)
+        }
@@ -0,0 +1,361 @@
+"""
+Merged multi-path graphs for the embeddable path viewers.
+
+Kept identical in knowledge_graph_streamlit_viewer/, vertex_cx_chatbot/ and
+bimei-vertex-cx-chatbot/ (each is deployed on its own); keep them in sync.
+
+create_graph_from_paths merges every ranked path into one graph through an id
+index, so nodes and relationships shared by several paths appear once and
+record which paths they belong to. render_paths_html draws that graph with
+vis-network in a page whose path selector highlights one path at a time in
+the browser, without a Streamlit rerun; render_paths_svg draws a
+static, pre-laid-out SVG for embeds that need no interaction. EmbedCache keeps built
+pages by payload hash so repeat embeds skip decoding and graph construction, and
+EmbedProfile times the stages of a load for the viewers' debug mode.
+"""
+
+import hashlib
+import html
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from path_codec import rel_type_of
+
+EMBED_CACHE_ENTRIES = int(os.getenv("EMBED_CACHE_ENTRIES", "256"))
+EMBED_CACHE_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# vis-network 9.1.2 (Apache-2.0 / MIT), vendored next to this module and inlined so a
+# rendered page loads nothing from a CDN. VIS_NETWORK_JS swaps in a hosted build for
+# smaller pages; it is only used together with its VIS_NETWORK_SRI integrity hash.
+VIS_NETWORK_JS_FILE = os.getenv(
+    "VIS_NETWORK_JS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "vis-network-9.1.2.min.js")
+)
+VIS_NETWORK_JS = os.getenv("VIS_NETWORK_JS", "")
+VIS_NETWORK_SRI = os.getenv("VIS_NETWORK_SRI", "")
+# The one vis-network stylesheet rule these pages use (node tooltips)
+VIS_TOOLTIP_CSS = (
+    ".vis-tooltip { position: absolute; visibility: hidden; padding: 5px; white-space: nowrap; "
+    "font-size: 13px; color: #000; background-color: #f5f4ed; border: 1px solid #808074; "
+    "border-radius: 3px; box-shadow: 3px 3px 10px rgba(0, 0, 0, .2); pointer-events: none; z-index: 5; }"
+)
+
+
+def vis_network_script():
+    """<script> element that loads vis-network: a pinned hosted build with SRI, else the vendored file inline"""
+    if VIS_NETWORK_JS:
+        if VIS_NETWORK_SRI:
+            return (f'<script src="{html.escape(VIS_NETWORK_JS)}" integrity="{html.escape(VIS_NETWORK_SRI)}" '
+                    f'crossorigin="anonymous"></script>')
+        print("VIS_NETWORK_JS is set without VIS_NETWORK_SRI; inlining the vendored vis-network instead")
+    with open(VIS_NETWORK_JS_FILE, encoding="utf-8") as f:
+        source = f.read()
+    return "<script>" + source.replace("</script", "<\\/script") + "</script>"
+
+
+VIS_NETWORK_SCRIPT = vis_network_script()
+
+NODE_COLORS = {
+    'Construct': '#3498db',
+    'InformationUse': '#e74c3c',
+    'ActionStatement': '#2ecc71',
+    'DictionaryItem': '#f39c12',
+    'Content': '#9b59b6',
+    'Deliverable': '#e67e22',
+    'Resource': '#1abc9c'
+}
+
+# Overlay colour per ranked path (cycled when there are more paths)
+PATH_COLORS = ['#f37f73', '#3b82f6', '#10b981', '#a855f7', '#f59e0b', '#ec4899']
+
+
+def get_node_color(node_type):
+    return NODE_COLORS.get(node_type, '#95a5a6')
+
+
+def short_label(label, limit=30):
+    return label[:limit] + "..." if len(label) > limit else label
+
+
+def create_graph_from_paths(paths_data):
+    """Merge all paths into one graph; nodes and edges carry the indices of their paths"""
+    if isinstance(paths_data, dict):
+        # {"paths": [...]} wrapper, as shown on the viewer's landing page
+        paths_data = paths_data.get('paths')
+    if not paths_data or not isinstance(paths_data, list):
+        return {'nodes': [], 'edges': [], 'paths': []}
+
+    nodes_dict = {}
+    edges_dict = {}
+    paths = []
+
+    for p, path in enumerate(paths_data):
+        if not isinstance(path, dict):
+            continue
+        path_nodes = path.get('nodes', [])
+        path_rels = path.get('rels', [])
+        node_ids = []
+        edge_ids = []
+
+        for i, node in enumerate(path_nodes):
+            node_id = str(node.get('id', f"node_{p}_{i}"))
+            node_ids.append(node_id)
+            if node_id not in nodes_dict:
+                node_type = node.get('type', 'Unknown')
+                node_label = str(node.get('label', f"Node {i}"))
+                nodes_dict[node_id] = {
+                    'id': node_id,
+                    'label': short_label(node_label),
+                    'title': f"{node_label} ({node_type})",
+                    'type': node_type,
+                    'color': get_node_color(node_type),
+                    'size': 25,
+                    'paths': []
+                }
+            if p not in nodes_dict[node_id]['paths']:
+                nodes_dict[node_id]['paths'].append(p)
+
+        # Edges between consecutive nodes; the same relationship walked in either
+        # direction by different paths is one edge
+        for i in range(len(node_ids) - 1):
+            source_id, target_id = node_ids[i], node_ids[i + 1]
+            rel_type = rel_type_of(path_rels[i]) if i < len(path_rels) else 'CONNECTED_TO'
+            key = (min(source_id, target_id), max(source_id, target_id), rel_type)
+            if key not in edges_dict:
+                edges_dict[key] = {
+                    'id': f"e{len(edges_dict)}",
+                    'source': source_id,
+                    'target': target_id,
+                    'label': rel_type,
+                    'type': rel_type,
+                    'paths': []
+                }
+            edge = edges_dict[key]
+            if p not in edge['paths']:
+                edge['paths'].append(p)
+            edge_ids.append(edge['id'])
+
+        paths.append({
+            'index': p,
+            'nodes': node_ids,
+            'edges': edge_ids,
+            'hops': len(edge_ids),
+            'score': path.get('score', path.get('score_norm')),
+            'color': PATH_COLORS[len(paths) % len(PATH_COLORS)]
+        })
+
+    return {
+        'nodes': list(nodes_dict.values()),
+        'edges': list(edges_dict.values()),
+        'paths': paths
+    }
+
+
+def path_option_label(path, position):
+    text = f"Path {position + 1} · {path['hops']} hops"
+    if isinstance(path.get('score'), (int, float)):
+        text += f" · score {path['score']:.2f}"
+    return text
+
+
+def _script_json(value):
+    # Safe inside <script>: no tag can be closed from the data
+    return json.dumps(value).replace("</", "<\\/")
+
+
+def render_paths_html(graph_data, height=400):
+    """vis-network page with a client-side path selector"""
+    options = ['<option value="all">All paths</option>'] + [
+        f'<option value="{i}">{html.escape(path_option_label(path, i))}</option>'
+        for i, path in enumerate(graph_data['paths'])
+    ]
+    selector_display = "block" if len(graph_data['paths']) > 1 else "none"
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+{VIS_NETWORK_SCRIPT}
+<style>
+  body {{ margin: 0; font-family: sans-serif; }}
+  #paths {{ display: {selector_display}; margin: 4px 0 6px; font-size: 13px; }}
+  #graph {{ height: {int(height)}px; background: #f8fafc; border: 1px solid #e2e8f0; border-radius: 8px; }}
+  {VIS_TOOLTIP_CSS}
+</style>
+</head>
+<body>
+<select id="paths">{''.join(options)}</select>
+<div id="graph"></div>
+<script>
+const graph = {_script_json(graph_data)};
+const nodes = new vis.DataSet(graph.nodes.map(n => ({{
+  id: n.id, label: n.label, title: n.title, color: n.color, size: n.size, shape: 'dot'
+}})));
+const edges = new vis.DataSet(graph.edges.map(e => ({{
+  id: e.id, from: e.source, to: e.target, label: e.label
+}})));
+new vis.Network(document.getElementById('graph'), {{nodes, edges}}, {{
+  physics: {{enabled: true}},
+  nodes: {{font: {{size: 14}}}},
+  edges: {{font: {{size: 12}}, arrows: 'to'}},
+  interaction: {{dragNodes: true, dragView: true, zoomView: true, hover: true}}
+}});
+
+function highlight(selected) {{
+  const path = selected === 'all' ? null : graph.paths[Number(selected)];
+  nodes.update(graph.nodes.map(n => {{
+    const on = !path || n.paths.includes(path.index);
+    return {{id: n.id, color: on ? n.color : '#e2e8f0', font: {{color: on ? '#343434' : '#cbd5e1'}}}};
+  }}));
+  edges.update(graph.edges.map(e => {{
+    const on = path && e.paths.includes(path.index);
+    const dim = path && !on;
+    return {{id: e.id, width: on ? 4 : 1, color: {{color: on ? path.color : (dim ? '#e2e8f0' : '#848484')}},
+             font: {{color: dim ? '#cbd5e1' : '#343434'}}}};
+  }}));
+}}
+document.getElementById('paths').addEventListener('change', ev => highlight(ev.target.value));
+</script>
+</body>
+</html>"""
+
+
+def layout_graph(graph_data, width=600, height=400, margin=50):
+    """Deterministic layered layout: a node's column is its earliest position on any path"""
+    depth = {}
+    for path in graph_data['paths']:
+        for i, node_id in enumerate(path['nodes']):
+            depth[node_id] = min(depth.get(node_id, i), i)
+    for node in graph_data['nodes']:
+        depth.setdefault(node['id'], 0)
+    columns = {}
+    for node in graph_data['nodes']:
+        columns.setdefault(depth[node['id']], []).append(node['id'])
+    last_column = max(columns) if columns else 0
+    positions = {}
+    for column, node_ids in columns.items():
+        x = margin + (width - 2 * margin) * (column / last_column if last_column else 0.5)
+        for row, node_id in enumerate(node_ids):
+            y = margin + (height - 2 * margin) * ((row + 1) / (len(node_ids) + 1))
+            positions[node_id] = (round(x, 1), round(y, 1))
+    return positions
+
+
+def render_paths_svg(graph_data, width=600, height=400, radius=12):
+    """Pre-laid-out static SVG; the top-ranked path is drawn in its overlay colour"""
+    positions = layout_graph(graph_data, width, height)
+    top_path = graph_data['paths'][0] if graph_data['paths'] else None
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="{width}" '
+        f'height="{height}" font-family="sans-serif">',
+        '<defs><marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="6" markerHeight="6" '
+        'orient="auto-start-reverse"><path d="M 0 0 L 10 5 L 0 10 z" fill="#848484"/></marker></defs>',
+        f'<rect width="{width}" height="{height}" fill="#f8fafc"/>'
+    ]
+    for edge in graph_data['edges']:
+        (x1, y1), (x2, y2) = positions[edge['source']], positions[edge['target']]
+        length = max(((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5, 1)
+        # Stop the line at the node circles
+        dx, dy = (x2 - x1) / length * radius, (y2 - y1) / length * radius
+        on_top = top_path is not None and top_path['index'] in edge['paths']
+        stroke = top_path['color'] if on_top else '#848484'
+        parts.append(
+            f'<line x1="{x1 + dx:.1f}" y1="{y1 + dy:.1f}" x2="{x2 - dx:.1f}" y2="{y2 - dy:.1f}" '
+            f'stroke="{stroke}" stroke-width="{3 if on_top else 1.5}" marker-end="url(#arrow)"/>'
+        )
+        parts.append(
+            f'<text x="{(x1 + x2) / 2:.1f}" y="{(y1 + y2) / 2 - 6:.1f}" font-size="11" fill="#555" '
+            f'text-anchor="middle">{html.escape(edge["label"])}</text>'
+        )
+    for node in graph_data['nodes']:
+        x, y = positions[node['id']]
+        parts.append(
+            f'<g><title>{html.escape(node["title"])}</title>'
+            f'<circle cx="{x}" cy="{y}" r="{radius}" fill="{node["color"]}"/>'
+            f'<text x="{x}" y="{y + radius + 14}" font-size="12" fill="#343434" '
+            f'text-anchor="middle">{html.escape(node["label"])}</text></g>'
+        )
+    parts.append('</svg>')
+    return "\n".join(parts)
+
+
+class EmbedProfile:
+    """Per-stage timings and payload sizes for one embed load (shown in debug mode)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = OrderedDict()
+        self.sizes = OrderedDict()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def size(self, name, value):
+        self.sizes[name] = value
+
+    def summary(self):
+        total = (time.perf_counter() - self.started) * 1000
+        timings = " · ".join(f"{name} {ms:.1f} ms" for name, ms in self.stages.items())
+        sizes = " · ".join(f"{name} {value:,}" for name, value in self.sizes.items())
+        return f"{timings} · total {total:.1f} ms | {sizes}"
+
+
+class EmbedCache:
+    """Content-addressed cache of built embeds: payload hash -> rendered page and counts.
+    Bounded by entry count and total bytes; least recently used entries go first."""
+
+    def __init__(self, max_entries=EMBED_CACHE_ENTRIES, max_bytes=EMBED_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(kind, raw):
+        return hashlib.sha256(f"{kind}:{raw}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "evictions": self.evictions
+            }
@@ -0,0 +1,120 @@
+"""
+Lean path renderer: a small WSGI app that turns a path payload into a
+vis-network page or a pre-laid-out SVG, without a Streamlit
+session per embed. The Streamlit viewer stays as the interactive fallback.
+
+Kept identical in knowledge_graph_streamlit_viewer/, vertex_cx_chatbot/ and
+bimei-vertex-cx-chatbot/ (each is deployed on its own); keep them in sync.
+
+    GET /render?p=<compact>            HTML (vis-network, with path selector)
+    GET /render?pid=<id>&format=svg    static SVG
+    GET /render?paths=<JSON>           legacy JSON payloads
+    GET /stats                         response cache counters
+
+Run locally with `python path_server.py` (PATH_SERVER_PORT, default 8502) or
+in production with any WSGI server, e.g. `gunicorn path_server:app`.
+"""
+
+import json
+import os
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs
+from wsgiref.simple_server import WSGIServer, make_server
+
+from path_codec import PayloadError, decode_paths, load_payload, validate_paths
+from path_render import EmbedCache, create_graph_from_paths, render_paths_html, render_paths_svg
+
+PORT = int(os.getenv("PATH_SERVER_PORT", "8502"))
+# Payloads are content-addressed, so a rendered response never changes
+CACHE_CONTROL = "public, max-age=86400, immutable"
+
+response_cache = EmbedCache()
+
+FORMATS = {
+    "html": ("text/html; charset=utf-8", lambda graph, width, height: render_paths_html(graph, height)),
+    "svg": ("image/svg+xml", render_paths_svg)
+}
+
+
+def parse_payload(kind, raw):
+    """Same payload forms as the Streamlit viewer; raises PayloadError on bad input or shape"""
+    if kind == 'p':
+        return validate_paths(decode_paths(raw))
+    if kind == 'pid':
+        return validate_paths(load_payload(raw))
+    try:
+        paths = json.loads(raw)
+    except (ValueError, RecursionError) as e:
+        raise PayloadError(f"Invalid JSON: {e}")
+    return validate_paths(paths)
+
+
+def _int_param(params, name, default, low, high):
+    try:
+        return min(max(int(params.get(name, [default])[0]), low), high)
+    except ValueError:
+        return default
+
+
+def render(params):
+    """(status, content type, body bytes, etag) for a /render query"""
+    kind = next((k for k in ('p', 'pid', 'paths') if k in params), None)
+    if kind is None:
+        return "400 Bad Request", "text/plain", b"Pass the path payload as ?p=, ?pid= or ?paths=", None
+    fmt = params.get('format', ['html'])[0]
+    if fmt not in FORMATS:
+        return "400 Bad Request", "text/plain", b"format must be html or svg", None
+    width = _int_param(params, 'width', 600, 200, 2000)
+    height = _int_param(params, 'height', 400, 150, 2000)
+
+    raw = params[kind][0]
+    key = response_cache.key(f"{kind}:{fmt}:{width}x{height}", raw)
+    body = response_cache.get(key)
+    if body is None:
+        try:
+            graph_data = create_graph_from_paths(parse_payload(kind, raw))
+        except PayloadError as e:
+            return "400 Bad Request", "text/plain", f"Error parsing path data: {e}".encode("utf-8"), None
+        except Exception as e:
+            # Anything else the payload content triggers is still the client's input
+            return "400 Bad Request", "text/plain", f"Could not build a graph from the payload: {e}".encode("utf-8"), None
+        if not graph_data['nodes']:
+            return "422 Unprocessable Entity", "text/plain", b"No graph data to display", None
+        body = FORMATS[fmt][1](graph_data, width, height).encode("utf-8")
+        response_cache.put(key, body, len(body))
+    return "200 OK", FORMATS[fmt][0], body, f'"{key[:32]}"'
+
+
+def app(environ, start_response):
+    path = environ.get('PATH_INFO', '')
+    if environ.get('REQUEST_METHOD') not in ('GET', 'HEAD'):
+        start_response("405 Method Not Allowed", [("Allow", "GET, HEAD")])
+        return [b""]
+    if path == '/stats':
+        body = json.dumps(response_cache.stats()).encode("utf-8")
+        start_response("200 OK", [("Content-Type", "application/json"), ("Content-Length", str(len(body)))])
+        return [body]
+    if path != '/render':
+        start_response("404 Not Found", [("Content-Type", "text/plain")])
+        return [b"Not found"]
+
+    status, content_type, body, etag = render(parse_qs(environ.get('QUERY_STRING', '')))
+    headers = [("Content-Type", content_type), ("Access-Control-Allow-Origin", "*")]
+    if etag:
+        headers += [("ETag", etag), ("Cache-Control", CACHE_CONTROL)]
+        if environ.get('HTTP_IF_NONE_MATCH') == etag:
+            start_response("304 Not Modified", headers)
+            return [b""]
+    headers.append(("Content-Length", str(len(body))))
+    start_response(status, headers)
+    return [body]
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+if __name__ == "__main__":
+    with make_server("", PORT, app, server_class=ThreadingWSGIServer) as server:
+        print(f"Path renderer on http://localhost:{PORT}/render")
+        server.serve_forever()
@@ -0,0 +1,145 @@
+"""
+Process-wide result cache for viewer Cypher queries.
+Entries are keyed on normalised query text + parameters, expire after a
+TTL and are evicted least-recently-used once the cache exceeds its memory
+budget. Writers (migrate_to_neo4j.py) call invalidate_query_cache() so
+viewers never serve results from before a migration or sync.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL", "300"))
+DEFAULT_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Touched on invalidation so every viewer process on the host drops its entries.
+# Point it at a shared volume when the viewer and the migration run on different hosts.
+INVALIDATION_STAMP = os.getenv(
+    "QUERY_CACHE_STAMP", os.path.join(tempfile.gettempdir(), "bimei_query_cache.stamp")
+)
+STAMP_CHECK_INTERVAL = 1.0
+
+
+def normalize_query(query):
+    """Collapse whitespace and a trailing semicolon so formatting does not split the cache"""
+    return " ".join(query.split()).rstrip(";").rstrip()
+
+
+def make_key(query, params=None, limit=None):
+    return json.dumps([normalize_query(query), params or {}, limit], sort_keys=True, default=str)
+
+
+def estimate_size(value):
+    """Approximate memory cost of a cached result, in bytes of its JSON form"""
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 1024
+
+
+def _read_stamp(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+class QueryCache:
+    """Thread-safe TTL + LRU cache bounded by an approximate byte budget"""
+
+    def __init__(self, ttl=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES, stamp_path=INVALIDATION_STAMP):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stamp_path = stamp_path
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._lock = threading.Lock()
+        self._stamp = _read_stamp(stamp_path)
+        self._stamp_checked = time.monotonic()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_stamp(self, now):
+        if now - self._stamp_checked < STAMP_CHECK_INTERVAL:
+            return
+        self._stamp_checked = now
+        stamp = _read_stamp(self.stamp_path)
+        if stamp != self._stamp:
+            self._stamp = stamp
+            self._clear()
+
+    def _clear(self):
+        self._entries.clear()
+        self.bytes = 0
+        self.invalidations += 1
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            self._check_stamp(now)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                    self.bytes -= entry[1]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, value):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self.bytes += size
+            while self.bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+
+query_cache = QueryCache()
+
+
+def invalidate_query_cache(stamp_path=INVALIDATION_STAMP):
+    """Drop cached results in this process and signal other viewer processes via the stamp file"""
+    query_cache.invalidate()
+    try:
+        with open(stamp_path, "a"):
+            pass
+        os.utime(stamp_path, None)
+    except OSError as e:
+        print(f"Could not update query cache stamp {stamp_path}: {e}")
+
+
+def invalidation_stamp(stamp_path=INVALIDATION_STAMP):
+    """Current stamp value; changes whenever invalidate_query_cache() runs on this host (or share)"""
+    return _read_stamp(stamp_path)
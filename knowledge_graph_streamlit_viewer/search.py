@@ -0,0 +1,102 @@
+"""
+Full-text term search for the viewers.
+Maintains one Neo4j full-text index over title/name/label/desc for every
+non-Chunk label and turns user terms into safe Lucene queries, so searches
+resolve a ranked set of candidate nodes before expanding any relationships.
+"""
+
+import os
+import re
+
+FULLTEXT_INDEX = os.getenv("FULLTEXT_INDEX", "nodeSearch")
+SEARCH_PROPERTIES = ("title", "name", "label", "desc")
+EXCLUDED_LABELS = ("Chunk",)
+DEFAULT_CANDIDATES = 10
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def lucene_query(term):
+    """Turn a user term into a Lucene query requiring every word as a prefix.
+
+    Only word characters survive, so no Lucene syntax can be injected:
+    'Process (Mat' -> 'process* AND mat*'.
+    """
+    return " AND ".join(f"{word}*" for word in _WORD.findall(term.lower()))
+
+
+def _indexed_labels(session):
+    record = session.run(
+        "SHOW FULLTEXT INDEXES YIELD name, labelsOrTypes WHERE name = $name RETURN labelsOrTypes",
+        name=FULLTEXT_INDEX
+    ).single()
+    return set(record["labelsOrTypes"]) if record else None
+
+
+def ensure_fulltext_index(session, labels=None):
+    """Create (or widen) the full-text index so it covers every non-Chunk label.
+
+    `labels` adds labels the caller knows about on top of db.labels().
+    Returns True when the index exists and is online.
+    """
+    wanted = {record["label"] for record in session.run("CALL db.labels() YIELD label RETURN label")}
+    wanted |= set(labels or ())
+    wanted -= set(EXCLUDED_LABELS)
+    if not wanted:
+        return False
+    
+    current = _indexed_labels(session)
+    if current is not None and not wanted <= current:
+        session.run(f"DROP INDEX {FULLTEXT_INDEX} IF EXISTS").consume()
+        current = None
+    if current is None:
+        label_list = "|".join(f"`{label}`" for label in sorted(wanted))
+        property_list = ", ".join(f"n.`{prop}`" for prop in SEARCH_PROPERTIES)
+        session.run(
+            f"CREATE FULLTEXT INDEX {FULLTEXT_INDEX} IF NOT EXISTS "
+            f"FOR (n:{label_list}) ON EACH [{property_list}]"
+        ).consume()
+        session.run("CALL db.awaitIndexes(300)").consume()
+    return True
+
+
+def search_params(term, candidates=DEFAULT_CANDIDATES):
+    """Parameters for a single-term full-text template"""
+    return {"index": FULLTEXT_INDEX, "search": lucene_query(term), "candidates": candidates}
+
+
+def path_search_params(term1, term2, candidates=DEFAULT_CANDIDATES):
+    """Parameters for a two-term (connection between X and Y) full-text template"""
+    return {
+        "index": FULLTEXT_INDEX,
+        "search1": lucene_query(term1),
+        "search2": lucene_query(term2),
+        "candidates": candidates
+    }
+
+
+# Ranked candidate ids first, then expand neighbourhoods only from those nodes
+SEARCH_QUERY = """
+CALL db.index.fulltext.queryNodes($index, $search) YIELD node, score
+WITH node, score ORDER BY score DESC LIMIT $candidates
+MATCH (node)-[r]-(m)
+WHERE NOT 'Chunk' IN labels(m)
+RETURN node AS n, r, m LIMIT $limit
+"""
+
+CANDIDATE_IDS = """
+CALL db.index.fulltext.queryNodes($index, $search) YIELD node, score
+WITH node, score ORDER BY score DESC LIMIT $candidates
+RETURN collect(elementId(node)) AS ids
+"""
+
+CANDIDATE_PAIRS = """
+CALL db.index.fulltext.queryNodes($index, $search1) YIELD node, score
+WITH node, score ORDER BY score DESC LIMIT $candidates
+WITH collect(node) AS sources
+CALL db.index.fulltext.queryNodes($index, $search2) YIELD node, score
+WITH sources, node, score ORDER BY score DESC LIMIT $candidates
+UNWIND sources AS a
+WITH a, node AS b
+WHERE a <> b
+"""
@@ -0,0 +1,54 @@
+"""
+Regression tests for path_engine.PathEngine.
+Run with `python -m unittest test_path_engine` from this folder (no database needed).
+"""
+
+import unittest
+
+from path_engine import PathEngine
+
+WEIGHTS = {"A": 0.9, "B": 0.5}
+
+
+def engine(*edges):
+    return PathEngine(
+        [(source, target, rel_type, f"r{i}") for i, (source, target, rel_type) in enumerate(edges)],
+        WEIGHTS
+    )
+
+
+class OverlappingCandidatesTest(unittest.TestCase):
+    def test_source_that_is_also_a_target_is_reached_from_another_source(self):
+        paths = engine(("n0", "n3", "A")).k_best_paths({"n0", "n3"}, {"n3"}, 3)
+        self.assertEqual([path["nodes"] for path in paths], [["n0", "n3"]])
+
+    def test_no_zero_hop_path(self):
+        self.assertEqual(engine(("n0", "n1", "A")).k_best_paths({"n0"}, {"n0"}, 3), [])
+
+    def test_overlapping_sets_rank_every_direction(self):
+        # "BIM" vs "BIM maturity": both candidate sets contain n1
+        paths = engine(("n0", "n1", "A"), ("n1", "n2", "B")).k_best_paths({"n0", "n1"}, {"n1", "n2"}, 3)
+        self.assertEqual(
+            sorted(tuple(path["nodes"]) for path in paths),
+            [("n0", "n1"), ("n1", "n2")]
+        )
+        for path in paths:
+            self.assertTrue(path["rels"])
+            self.assertNotEqual(path["nodes"][0], path["nodes"][-1])
+
+    def test_path_through_another_source(self):
+        paths = engine(("n0", "n1", "A"), ("n1", "n2", "A")).k_best_paths({"n0", "n1"}, {"n0"}, 3)
+        self.assertEqual([path["nodes"] for path in paths], [["n1", "n0"]])
+
+
+class DisjointCandidatesTest(unittest.TestCase):
+    def test_k_paths_cheapest_first(self):
+        graph = engine(("s", "a", "A"), ("a", "t", "A"), ("s", "b", "B"), ("b", "t", "B"), ("s", "t", "B"))
+        paths = graph.k_best_paths({"s"}, {"t"}, 3)
+        self.assertEqual(len(paths), 3)
+        self.assertEqual([path["cost"] for path in paths], sorted(path["cost"] for path in paths))
+        self.assertEqual(paths[0]["nodes"], ["s", "a", "t"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,8 @@
 # Add this to your app.py after the driver initialization
 
 import json
+from graph_view import graph_view_for
+from search import CANDIDATE_PAIRS, path_search_params
 
 # Load relationship weights
 @st.cache_data
@@ -28,9 +30,15 @@ def load_relationship_weights():
                 "CONTAINS": 0.7
             }
 
+# Endpoints come from the full-text index (see search.py) instead of a MATCH (a), (b) scan
+WEIGHTED_PATH_QUERY = CANDIDATE_PAIRS + """
+CALL apoc.algo.dijkstra(a, b, 'RELATES_TO|IS_PART_OF|DEFINES', 'weight') YIELD path
+RETURN path
+"""
+
 # Update the shortestPath query to use weighted paths
 def convert_natural_to_cypher_with_weights(natural_text):
-    """Convert natural language to Cypher query with weighted relationships"""
+    """Convert natural language to a parameterised Cypher query; returns (query, params)"""
     text = natural_text.lower()
     
     if "connection between" in text or "relationship between" in text:
@@ -43,27 +51,20 @@ def convert_natural_to_cypher_with_weights(natural_text):
                 term2 = term2.strip()
                 
                 # Use weighted shortest path
-                return f"""
-                MATCH (a), (b)
-                WHERE (toLower(a.title) CONTAINS '{term1}' OR toLower(a.name) CONTAINS '{term1}') 
-                AND (toLower(b.title) CONTAINS '{term2}' OR toLower(b.name) CONTAINS '{term2}')
-                CALL apoc.algo.dijkstra(a, b, 'RELATES_TO|IS_PART_OF|DEFINES', 'weight') YIELD path
-                RETURN path
-                """
+                return WEIGHTED_PATH_QUERY, path_search_params(term1, term2)
     
     # ... rest of your existing logic
-    return "MATCH (n:Content)-[r]-(m) RETURN n, r, m"
+    return "MATCH (n:Content)-[r]-(m) RETURN n, r, m LIMIT $limit", {}
 
 # Update edge visualization to show weights
-def create_weighted_edges(edges, weights):
+def create_weighted_edges(edges, weights, view=None):
     """Create edges with visual weight representation"""
+    if view is None:
+        view = graph_view_for(st.session_state)
     vis_edges = []
     for edge in edges:
         # Skip edges connected to chunk nodes
-        source_node = next((n for n in st.session_state.current_data['nodes'] if n['id'] == edge['source']), None)
-        target_node = next((n for n in st.session_state.current_data['nodes'] if n['id'] == edge['target']), None)
-        
-        if (source_node and 'Chunk' in source_node['labels']) or (target_node and 'Chunk' in target_node['labels']):
+        if view.is_hidden(edge['source']) or view.is_hidden(edge['target']):
             continue
         
         # Get weight for this relationship type
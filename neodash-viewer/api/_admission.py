@@ -0,0 +1,127 @@
+"""
+Admission control for /ask.
+- At most max_concurrent requests do upstream work (LLM + Neo4j) at once.
+- Up to max_queue more wait for a slot; a request is rejected straight away
+  when the queue is full or when the expected wait would overrun its deadline.
+- Identical questions already in flight share the leader's result instead of
+  starting their own computation.
+Rejections raise Saturated, which carries a Retry-After hint in seconds.
+"""
+
+import math
+import threading
+import time
+
+
+class Saturated(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class _Flight:
+    """Result slot shared by every request coalesced onto one computation"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def finish(self, result=None, error=None):
+        self.result, self.error = result, error
+        self.done.set()
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent=4, max_queue=16, deadline=30.0, initial_service_time=5.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._inflight = {}
+        # Moving average of how long a slot is held, used to predict queue waits
+        self._service_time = initial_service_time
+        self._stats = {"admitted": 0, "coalesced": 0, "rejected_queue_full": 0, "rejected_deadline": 0}
+
+    def _expected_wait(self):
+        return (self._waiting + 1) * self._service_time / self.max_concurrent
+
+    def acquire(self, deadline=None):
+        """Take a slot, waiting until the deadline at most; returns the acquisition time"""
+        deadline = time.monotonic() + (self.deadline if deadline is None else deadline)
+        with self._cond:
+            if self._active >= self.max_concurrent:
+                if self._waiting >= self.max_queue:
+                    self._stats["rejected_queue_full"] += 1
+                    raise Saturated("Too many questions are queued", self._expected_wait())
+                if time.monotonic() + self._expected_wait() > deadline:
+                    self._stats["rejected_deadline"] += 1
+                    raise Saturated("The queue would not clear before the deadline", self._expected_wait())
+            self._waiting += 1
+            try:
+                while self._active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["rejected_deadline"] += 1
+                        raise Saturated("Timed out waiting for a free slot", self._expected_wait())
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+            self._active += 1
+            self._stats["admitted"] += 1
+        return time.monotonic()
+
+    def release(self, acquired_at):
+        with self._cond:
+            self._active -= 1
+            held = time.monotonic() - acquired_at
+            self._service_time = 0.8 * self._service_time + 0.2 * held
+            self._cond.notify()
+
+    def run(self, key, fn, deadline=None):
+        """fn() under a slot; concurrent calls with the same key share one result"""
+        budget = self.deadline if deadline is None else deadline
+        with self._cond:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            if not flight.done.wait(budget):
+                raise Saturated("Timed out waiting for an identical question", self._expected_wait())
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            acquired_at = self.acquire(budget)
+            try:
+                result = fn()
+            finally:
+                self.release(acquired_at)
+        except Exception as e:
+            flight.finish(error=e)
+            raise
+        else:
+            flight.finish(result=result)
+            return result
+        finally:
+            with self._cond:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        with self._cond:
+            return dict(
+                self._stats,
+                active=self._active,
+                waiting=self._waiting,
+                in_flight_questions=len(self._inflight),
+                avg_service_seconds=round(self._service_time, 3),
+                max_concurrent=self.max_concurrent,
+                max_queue=self.max_queue
+            )
@@ -0,0 +1,136 @@
+"""
+Answer cache for /ask.
+Stores (generated Cypher, answer, visual payload) per question and serves a
+new question from the cache when it is an exact match after normalisation.
+With an embedding function configured, a paraphrase can also be served when
+its embedding is close enough to a cached question's *and* both questions
+share the same content words, numbers and negations; without one the cache
+is exact-match only.
+"""
+
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_NON_WORD = re.compile(r"[^\w\s]+", re.UNICODE)
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_NEGATION = re.compile(r"\b(?:not|no|never|none|nor|without|cannot)\b|n't\b")
+
+# Words that can differ between two phrasings of the same question
+STOP_WORDS = frozenset("""
+    a an the of in on at to for from by with about into and or
+    what which who whom whose where when how why
+    is are was were be been being do does did can could should would will shall may might must
+    me my i we our you your it its this that these those there their them they
+    please show list give tell find get display describe explain
+""".split())
+
+
+def normalize_question(question):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(_NON_WORD.sub(" ", (question or "").lower()).split())
+
+
+def question_signature(question):
+    """(content words, numbers, negated) that a paraphrase must keep to share an answer"""
+    text = (question or "").lower()
+    negated = bool(_NEGATION.search(text))
+    words = normalize_question(_NEGATION.sub(" ", text)).split()
+    content = frozenset(word for word in words if word not in STOP_WORDS)
+    return content, tuple(sorted(_NUMBER.findall(text))), negated
+
+
+def _unit(vector):
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else list(vector)
+
+
+class SemanticAnswerCache:
+    """LRU + TTL cache of /ask results; similarity lookups only when embed_fn is given"""
+
+    def __init__(self, embed_fn=None, threshold=0.9, max_entries=256, ttl=3600.0):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # normalised question -> entry dict
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _expire(self, now):
+        for key in [key for key, entry in self._entries.items() if entry["expires_at"] < now]:
+            del self._entries[key]
+
+    def lookup(self, question):
+        """Return (entry, kind) with kind "exact" or "semantic", or (None, None) on a miss"""
+        if self.max_entries <= 0:
+            return None, None
+        key = normalize_question(question)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry, "exact"
+            if self.embed_fn is None:
+                self.misses += 1
+                return None, None
+            entries = list(self._entries.items())
+
+        # Embedding and scoring run outside the lock
+        vector = _unit(self.embed_fn(question))
+        signature = question_signature(question)
+        best_key, best_score = None, self.threshold
+        for cached_key, cached in entries:
+            if cached["signature"] != signature:
+                continue
+            score = sum(a * b for a, b in zip(vector, cached["vector"]))
+            if score >= best_score:
+                best_key, best_score = cached_key, score
+
+        with self._lock:
+            entry = self._entries.get(best_key) if best_key is not None else None
+            if entry is None:
+                self.misses += 1
+                return None, None
+            self._entries.move_to_end(best_key)
+            self.semantic_hits += 1
+            return dict(entry, similarity=best_score), "semantic"
+
+    def store(self, question, cypher, answer, visual):
+        """Cache a computed answer; answers whose visual fetch failed are not kept"""
+        if self.max_entries <= 0 or (visual or {}).get("warning"):
+            return
+        entry = {
+            "question": question,
+            "vector": _unit(self.embed_fn(question)) if self.embed_fn is not None else None,
+            "signature": question_signature(question),
+            "cypher": cypher,
+            "answer": answer,
+            "visual": visual,
+            "expires_at": time.monotonic() + self.ttl
+        }
+        with self._lock:
+            self._entries[normalize_question(question)] = entry
+            self._entries.move_to_end(normalize_question(question))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses
+            }
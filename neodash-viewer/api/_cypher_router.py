@@ -0,0 +1,133 @@
+"""
+Tiered Cypher routing for /ask.
+1. Rule-based templates for question shapes we already know how to answer
+   ("categories", "random sample", "connection between X and Y", ...).
+2. A cache of normalised question -> Cypher that has already run successfully.
+3. LLM Cypher generation, only when neither of the above applies.
+Each tier keeps hit and latency counters.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from _answer_cache import normalize_question
+
+RoutedCypher = namedtuple("RoutedCypher", "cypher params tier")
+
+NOT_CHUNK = "NOT 'Chunk' IN labels(n) AND NOT 'Chunk' IN labels(m)"
+
+RULE_TEMPLATES = {
+    "categories": """
+        MATCH (n) WHERE NOT 'Chunk' IN labels(n)
+        RETURN labels(n) AS category, count(*) AS count
+        ORDER BY count DESC LIMIT 25
+        """,
+    "random": f"""
+        MATCH (n)-[r]->(m) WHERE {NOT_CHUNK}
+        RETURN n, r, m ORDER BY rand() LIMIT 20
+        """,
+    "relationships": f"""
+        MATCH (n)-[r]->(m) WHERE {NOT_CHUNK}
+        RETURN n, r, m LIMIT 25
+        """,
+    "connection": """
+        MATCH (a) WHERE toLower(coalesce(a.title, a.name, '')) CONTAINS $term1
+        WITH a LIMIT 10
+        MATCH (b) WHERE toLower(coalesce(b.title, b.name, '')) CONTAINS $term2 AND a <> b
+        WITH a, b LIMIT 25
+        MATCH p = shortestPath((a)-[*..6]-(b))
+        RETURN p ORDER BY length(p) LIMIT 3
+        """,
+}
+
+
+# Whole-question patterns (matched against the normalised question); anything else
+# goes to the cache and LLM tiers
+RULE_PATTERNS = [
+    ("connection", re.compile(
+        r"^(?:(?:show|find|what is|what s) )?(?:me )?(?:the )?(?:connection|relationship|path) "
+        r"between (?P<term1>.+?) and (?P<term2>.+)$"
+    )),
+    ("categories", re.compile(r"^(?:what|list|show)(?: are)?(?: all)? (?:the )?(?:node )?(?:categories|types)$")),
+    ("random", re.compile(r"^(?:show |give me )?(?:a )?random (?:sample|content)$")),
+    ("relationships", re.compile(r"^show (?:all )?(?:relationships|connections)$")),
+]
+
+
+def rule_cypher(question):
+    """Deterministic templates mirroring convert_natural_to_cypher in the Streamlit viewer"""
+    text = normalize_question(question)
+    for name, pattern in RULE_PATTERNS:
+        match = pattern.match(text)
+        if match:
+            return RULE_TEMPLATES[name], match.groupdict()
+    return None
+
+
+class TierStats:
+    def __init__(self):
+        self.hits = 0
+        self.total_seconds = 0.0
+
+    def record(self, seconds):
+        self.hits += 1
+        self.total_seconds += seconds
+
+    def as_dict(self):
+        return {
+            "hits": self.hits,
+            "avg_ms": 1000 * self.total_seconds / self.hits if self.hits else 0.0
+        }
+
+
+class CypherRouter:
+    """Routes a question to Cypher through rules, then the validated cache, then `generate_fn`"""
+
+    def __init__(self, generate_fn, rules=rule_cypher, cache_size=512):
+        self.generate_fn = generate_fn
+        self.rules = rules
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.tiers = {"rule": TierStats(), "cache": TierStats(), "llm": TierStats()}
+
+    def route(self, question):
+        start = time.perf_counter()
+        routed = self.rules(question)
+        if routed is not None:
+            self.tiers["rule"].record(time.perf_counter() - start)
+            return RoutedCypher(routed[0], routed[1], "rule")
+
+        key = normalize_question(question)
+        with self._lock:
+            cypher = self._cache.get(key)
+            if cypher is not None:
+                self._cache.move_to_end(key)
+        if cypher is not None:
+            self.tiers["cache"].record(time.perf_counter() - start)
+            return RoutedCypher(cypher, {}, "cache")
+
+        cypher = self.generate_fn(question)
+        self.tiers["llm"].record(time.perf_counter() - start)
+        return RoutedCypher(cypher, {}, "llm")
+
+    def remember(self, question, cypher):
+        """Cache LLM-generated Cypher once it has executed without error"""
+        if self.cache_size <= 0 or not cypher:
+            return
+        key = normalize_question(question)
+        with self._lock:
+            self._cache[key] = cypher
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def stats(self):
+        total = sum(tier.hits for tier in self.tiers.values())
+        stats = {name: tier.as_dict() for name, tier in self.tiers.items()}
+        for name, tier in self.tiers.items():
+            stats[name]["hit_rate"] = tier.hits / total if total else 0.0
+        stats["cached_questions"] = len(self._cache)
+        return stats
@@ -0,0 +1,126 @@
+"""
+Per-request stage tracing for /ask.
+A RequestTrace times named stages (cypher, graph_query, answer, visual, ...)
+and records row counts; finished traces feed process-wide Prometheus-style
+histograms served on /metrics and are rendered as a Server-Timing header.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+ROWS_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by one label (the stage name)"""
+
+    def __init__(self, name, help_text, buckets, label="stage"):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label = label
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            series = self._series.setdefault(
+                label_value, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            )
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_value, series in sorted(self._series.items()):
+                tag = f'{self.label}="{label_value}"'
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f'{self.name}_bucket{{{tag},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{tag},le="+Inf"}} {series["count"]}')
+                lines.append(f"{self.name}_sum{{{tag}}} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{{{tag}}} {series['count']}")
+        return "\n".join(lines)
+
+
+class Counter:
+    """Monotonic counter keyed by one label"""
+
+    def __init__(self, name, help_text, label):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_value, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{{{self.label}="{label_value}"}} {value}')
+        return "\n".join(lines)
+
+
+STAGE_SECONDS = Histogram("ask_stage_seconds", "Time spent in each /ask pipeline stage", SECONDS_BUCKETS)
+STAGE_ROWS = Histogram("ask_stage_rows", "Rows returned by each /ask pipeline stage", ROWS_BUCKETS)
+REQUEST_SECONDS = Histogram(
+    "ask_request_seconds", "End-to-end /ask latency by outcome", SECONDS_BUCKETS, label="outcome"
+)
+REQUESTS = Counter("ask_requests_total", "/ask requests by outcome", "outcome")
+
+
+class RequestTrace:
+    """Stage spans for one request; spans may be recorded from worker threads"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self.rows = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.spans.append((stage, elapsed))
+            STAGE_SECONDS.observe(stage, elapsed)
+
+    def count(self, stage, rows):
+        with self._lock:
+            self.rows[stage] = rows
+        STAGE_ROWS.observe(stage, rows)
+
+    def finish(self, outcome):
+        elapsed = time.perf_counter() - self.started
+        REQUEST_SECONDS.observe(outcome, elapsed)
+        REQUESTS.inc(outcome)
+        return elapsed
+
+    def server_timing(self):
+        """Server-Timing header value, durations in milliseconds"""
+        with self._lock:
+            spans = list(self.spans)
+        total = (time.perf_counter() - self.started) * 1000
+        parts = [f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in spans]
+        parts.append(f"total;dur={total:.1f}")
+        return ", ".join(parts)
+
+
+def render_metrics():
+    """Prometheus text exposition of every metric in this module"""
+    return "\n".join(
+        metric.render() for metric in (REQUESTS, REQUEST_SECONDS, STAGE_SECONDS, STAGE_ROWS)
+    ) + "\n"
@@ -0,0 +1,183 @@
+"""
+Derives the visualization query from the Cypher used to answer a question.
+The final RETURN (and everything after it) is replaced by a bounded projection
+of the node, relationship and path variables still in scope, returning only
+ids, labels and captions. Aggregating queries keep their MATCH, so the graph
+shows what was counted. Only the first branch of a UNION is used.
+"""
+
+import re
+
+IDENT = r"[A-Za-z_]\w*"
+# Function calls such as count(p) are not patterns, hence the lookbehind
+NODE_VAR = re.compile(r"(?<![\w.])\(\s*(" + IDENT + r")\s*(?=[:{)])")
+REL_VAR = re.compile(r"-\s*\[\s*(" + IDENT + r")\s*([^\]]*)\]")
+PATH_VAR = re.compile(
+    r"(?:\bMATCH|,)\s*(" + IDENT + r")\s*=\s*(?:shortestPath|allShortestPaths)?\s*\(", re.IGNORECASE
+)
+CLAUSE = re.compile(r"\b(RETURN|WITH|UNION)\b", re.IGNORECASE)
+WITH_TAIL = re.compile(r"\b(WHERE|ORDER\s+BY|SKIP|LIMIT)\b", re.IGNORECASE)
+ALIAS = re.compile(r"^(.*?)\s+AS\s+(" + IDENT + r")$", re.IGNORECASE | re.DOTALL)
+
+PROJECTION = """
+WITH {variables} LIMIT $viz_rows
+WITH {node_list} AS ns, {rel_list} AS rs
+WITH collect(ns) AS nss, collect(rs) AS rss
+WITH reduce(acc = [], x IN nss | acc + x) AS ns, reduce(acc = [], x IN rss | acc + x) AS rs
+UNWIND ns AS n
+WITH collect(DISTINCT n)[..$viz_nodes] AS ns, rs
+RETURN [n IN ns | {{id: elementId(n), labels: labels(n), caption: coalesce(n.name, n.title, head(labels(n)))}}] AS nodes,
+       [r IN rs WHERE startNode(r) IN ns AND endNode(r) IN ns |
+        {{id: elementId(r), type: type(r), source: elementId(startNode(r)), target: elementId(endNode(r))}}][..$viz_edges] AS edges
+"""
+
+
+def mask(cypher):
+    """Blank out string literals and comments, keeping offsets, and mark {} / [] nesting depth.
+
+    Variables introduced inside braces (subqueries, map projections) or
+    brackets (pattern and list comprehensions) are local to them.
+    """
+    out = []
+    depth = []
+    level = 0
+    i = 0
+    while i < len(cypher):
+        ch = cypher[i]
+        if ch in "'\"`":
+            end = i + 1
+            while end < len(cypher) and cypher[end] != ch:
+                end += 2 if cypher[end] == "\\" else 1
+            end = min(end + 1, len(cypher))
+            out.append(" " * (end - i))
+            depth.extend([level] * (end - i))
+            i = end
+            continue
+        if cypher.startswith("//", i):
+            end = cypher.find("\n", i)
+            end = len(cypher) if end == -1 else end
+            out.append(" " * (end - i))
+            depth.extend([level] * (end - i))
+            i = end
+            continue
+        if cypher.startswith("/*", i):
+            end = cypher.find("*/", i + 2)
+            end = len(cypher) if end == -1 else end + 2
+            out.append(" " * (end - i))
+            depth.extend([level] * (end - i))
+            i = end
+            continue
+        if ch in "{[":
+            level += 1
+        out.append(ch)
+        depth.append(level)
+        if ch in "}]":
+            level = max(0, level - 1)
+        i += 1
+    return "".join(out), depth
+
+
+def top_level(pattern, masked, depth, start=0, end=None):
+    end = len(masked) if end is None else end
+    return [m for m in pattern.finditer(masked, start, end) if depth[m.start()] == 0]
+
+
+def split_top_level(text):
+    parts, level, current = [], 0, []
+    for ch in text:
+        if ch in "([{":
+            level += 1
+        elif ch in ")]}":
+            level -= 1
+        if ch == "," and level == 0:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+    parts.append("".join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+def bound_variables(masked, depth, start, end):
+    """name -> 'node' | 'rel' | 'rels' | 'path' for patterns in masked[start:end]"""
+    kinds = {}
+    for m in top_level(PATH_VAR, masked, depth, start, end):
+        kinds[m.group(1)] = "path"
+    for m in top_level(NODE_VAR, masked, depth, start, end):
+        kinds.setdefault(m.group(1), "node")
+    for m in top_level(REL_VAR, masked, depth, start, end):
+        kinds.setdefault(m.group(1), "rels" if "*" in m.group(2) else "rel")
+    return kinds
+
+
+def scoped_variables(cypher):
+    """Graph variables visible at the final RETURN, and the offset of that RETURN"""
+    masked, depth = mask(cypher)
+    clauses = top_level(CLAUSE, masked, depth)
+    union = next((i for i, m in enumerate(clauses) if m.group(1).upper() == "UNION"), None)
+    if union is not None:
+        clauses = clauses[:union]
+    returns = [m for m in clauses if m.group(1).upper() == "RETURN"]
+    if not returns:
+        return {}, None
+    final_return = returns[-1].start()
+
+    scope = {}
+    segment_start = 0
+    for m in clauses:
+        if m.start() >= final_return:
+            break
+        if m.group(1).upper() != "WITH":
+            continue
+        known = dict(scope, **bound_variables(masked, depth, segment_start, m.start()))
+        nxt = next((c.start() for c in clauses if c.start() > m.start()), final_return)
+        tail = top_level(WITH_TAIL, masked, depth, m.end(), nxt)
+        items_end = tail[0].start() if tail else nxt
+        scope = {}
+        for item in split_top_level(masked[m.end():items_end]):
+            if item == "*":
+                scope.update(known)
+                continue
+            aliased = ALIAS.match(item)
+            expr, name = (aliased.group(1).strip(), aliased.group(2)) if aliased else (item, item)
+            if expr in known:
+                scope[name] = known[expr]
+        segment_start = m.end()
+    scope.update(bound_variables(masked, depth, segment_start, final_return))
+    return scope, final_return
+
+
+def derive_viz_query(cypher):
+    """Bounded id/label/caption projection, or None when no graph variables are in scope"""
+    scope, final_return = scoped_variables(cypher)
+    if not scope:
+        return None
+    nodes = [name for name, kind in scope.items() if kind == "node"]
+    rels = [name for name, kind in scope.items() if kind == "rel"]
+    node_list = " + ".join(
+        [f"[x IN [{', '.join(nodes)}] WHERE x IS NOT NULL]"] if nodes else ["[]"]
+    ) + "".join(f" + coalesce(nodes({name}), [])" for name, kind in scope.items() if kind == "path")
+    rel_list = " + ".join(
+        [f"[x IN [{', '.join(rels)}] WHERE x IS NOT NULL]"] if rels else ["[]"]
+    ) + "".join(
+        f" + coalesce(relationships({name}), [])" for name, kind in scope.items() if kind == "path"
+    ) + "".join(f" + coalesce({name}, [])" for name, kind in scope.items() if kind == "rels")
+    projection = PROJECTION.format(variables=", ".join(scope), node_list=node_list, rel_list=rel_list)
+    return cypher[:final_return].rstrip() + "\n" + projection.strip()
+
+
+def projection_to_graph(record, node_factory, edge_factory):
+    """Turn the single projection row into {"nodes": [...], "edges": [...]}"""
+    if record is None:
+        return {"nodes": [], "edges": []}
+    nodes = [
+        node_factory(node["id"], node["labels"], {"caption": node["caption"]})
+        for node in record["nodes"]
+    ]
+    edges, seen = [], set()
+    for rel in record["edges"]:
+        if rel["id"] in seen:
+            continue
+        seen.add(rel["id"])
+        edges.append(edge_factory(rel["id"], rel["type"], rel["source"], rel["target"], {}))
+    return {"nodes": nodes, "edges": edges}
@@ -1,11 +1,23 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
+import json
 import os
-import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from neo4j import GraphDatabase
 from langchain_community.graphs import Neo4jGraph
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_community.chains.graph_qa.cypher import GraphCypherQAChain
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from langchain_community.chains.graph_qa.cypher import GraphCypherQAChain, extract_cypher
+
+# Helper modules live next to this file (underscore-prefixed so Vercel does not serve them)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _admission import AdmissionController, Saturated
+from _answer_cache import SemanticAnswerCache, normalize_question
+from _cypher_router import CypherRouter
+from _metrics import RequestTrace, render_metrics
+from _viz_query import derive_viz_query, projection_to_graph
 
 app = Flask(__name__)
 CORS(app)
@@ -15,101 +27,290 @@ URI = os.environ.get("NEO4J_URI")
 USER = os.environ.get("NEO4J_USER")
 PASSWORD = os.environ.get("NEO4J_PASSWORD")
 GOOGLE_KEY = os.environ.get("GOOGLE_API_KEY")
+NEO4J_POOL_SIZE = int(os.environ.get("NEO4J_POOL_SIZE", "10"))
+NEO4J_ACQUIRE_TIMEOUT = float(os.environ.get("NEO4J_ACQUIRE_TIMEOUT", "10"))
+SCHEMA_TTL_SECONDS = float(os.environ.get("SCHEMA_TTL_SECONDS", "3600"))
+
+# Paraphrase matching needs a real embedding model; without one the cache is exact-match only
+ANSWER_CACHE_EMBEDDING_MODEL = os.environ.get("ANSWER_CACHE_EMBEDDING_MODEL", "")
+_embeddings = None
+
+def embed_question(question):
+    global _embeddings
+    if _embeddings is None:
+        _embeddings = GoogleGenerativeAIEmbeddings(model=ANSWER_CACHE_EMBEDDING_MODEL, google_api_key=GOOGLE_KEY)
+    return _embeddings.embed_query(question)
+
+# Repeated (and, with an embedder, paraphrased) questions are answered from memory (ANSWER_CACHE_SIZE=0 disables)
+answer_cache = SemanticAnswerCache(
+    embed_fn=embed_question if ANSWER_CACHE_EMBEDDING_MODEL else None,
+    threshold=float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.9")),
+    max_entries=int(os.environ.get("ANSWER_CACHE_SIZE", "256")),
+    ttl=float(os.environ.get("ANSWER_CACHE_TTL", "3600"))
+)
+
+# Bounded upstream work: a few questions at a time, a short queue, identical questions coalesced
+admission = AdmissionController(
+    max_concurrent=int(os.environ.get("ASK_MAX_CONCURRENT", "4")),
+    max_queue=int(os.environ.get("ASK_MAX_QUEUE", "16")),
+    deadline=float(os.environ.get("ASK_DEADLINE_SECONDS", "30"))
+)
+
+# Warm resources: built on first use and reused by every request this process serves
+_resource_lock = threading.Lock()
+_driver = None
+_graph = None
+_chain = None
+_chain_built_at = 0.0
+
+def get_driver():
+    """Shared driver for visual fetches; TLS and routing discovery happen once"""
+    global _driver
+    if _driver is None:
+        with _resource_lock:
+            if _driver is None:
+                _driver = GraphDatabase.driver(
+                    URI, auth=(USER, PASSWORD),
+                    max_connection_pool_size=NEO4J_POOL_SIZE,
+                    connection_acquisition_timeout=NEO4J_ACQUIRE_TIMEOUT,
+                    keep_alive=True
+                )
+    return _driver
+
+def get_graph():
+    """LangChain graph; the schema is not read at import, only when the chain is built"""
+    global _graph
+    if _graph is None:
+        with _resource_lock:
+            if _graph is None:
+                _graph = Neo4jGraph(
+                    url=URI, username=USER, password=PASSWORD,
+                    refresh_schema=False,
+                    driver_config={
+                        "max_connection_pool_size": NEO4J_POOL_SIZE,
+                        "connection_acquisition_timeout": NEO4J_ACQUIRE_TIMEOUT
+                    }
+                )
+    return _graph
+
+def get_chain():
+    """GraphCypherQAChain built once; rebuilt after SCHEMA_TTL_SECONDS to pick up schema changes"""
+    global _chain, _chain_built_at
+    if _chain is None or time.monotonic() - _chain_built_at > SCHEMA_TTL_SECONDS:
+        graph = get_graph()
+        with _resource_lock:
+            if _chain is None or time.monotonic() - _chain_built_at > SCHEMA_TTL_SECONDS:
+                graph.refresh_schema()
+                _chain = GraphCypherQAChain.from_llm(
+                    ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=GOOGLE_KEY),
+                    graph=graph,
+                    verbose=True,
+                    return_intermediate_steps=True,
+                    allow_dangerous_requests=True
+                )
+                _chain_built_at = time.monotonic()
+    return _chain
+
+def _text(output):
+    """LLM chains return a plain string or a {"text": ...} dict depending on the LangChain version"""
+    return output.get("text", "") if isinstance(output, dict) else str(output)
+
+def generate_cypher(question):
+    """LLM tier: the chain's own Cypher prompt, without running the rest of the chain"""
+    chain = get_chain()
+    output = chain.cypher_generation_chain.invoke({"question": question, "schema": chain.graph_schema})
+    return extract_cypher(_text(output))
+
+def answer_from_context(question, context):
+    """Answer synthesis over the query results with the chain's QA prompt"""
+    return _text(get_chain().qa_chain.invoke({"question": question, "context": context}))
+
+cypher_router = CypherRouter(
+    generate_cypher, cache_size=int(os.environ.get("CYPHER_CACHE_SIZE", "512"))
+)
+
+# Bounds on the visualization projection: source rows, distinct nodes, relationships
+VIZ_LIMITS = {
+    "viz_rows": int(os.environ.get("VIZ_ROW_LIMIT", "50")),
+    "viz_nodes": int(os.environ.get("VIZ_NODE_LIMIT", "100")),
+    "viz_edges": int(os.environ.get("VIZ_EDGE_LIMIT", "200")),
+}
+
+def first_of(props, keys, default=None):
+    """First truthy property among `keys`, e.g. a caption fallback chain"""
+    for key in keys:
+        value = props.get(key)
+        if value:
+            return value
+    return default
+
+def viz_node(node_id, labels, props):
+    # Smart Caption: Caption > Name > Title > Label
+    caption = str(first_of(props, ('caption', 'name', 'title'), labels[0] if labels else None))
+    return {
+        "id": node_id,
+        "label": caption[:20] + "..." if len(caption) > 20 else caption,
+        "group": labels[0] if labels else "Generic",
+        "title": caption # Tooltip (full caption)
+    }
+
+def viz_edge(rel_id, rel_type, source, target, props):
+    return {"from": source, "to": target, "label": rel_type}
+
+def fetch_visual(generated_cypher, params, trace):
+    with trace.span("visual"):
+        viz_query = derive_viz_query(generated_cypher)
+        if viz_query is None:
+            return {"nodes": [], "edges": [], "warning": "The query binds no nodes, relationships or paths to draw"}
+        try:
+            with get_driver().session() as session:
+                record = session.run(viz_query, dict(params, **VIZ_LIMITS)).single()
+                viz_data = projection_to_graph(record, viz_node, viz_edge)
+        except Exception as e:
+            # The text answer is still returned; the failure is reported alongside it
+            print(f"Visual Fetch Failed: {e}")
+            return {"nodes": [], "edges": [], "warning": f"Visual fetch failed: {e}"}
+    trace.count("visual_nodes", len(viz_data["nodes"]))
+    trace.count("visual_edges", len(viz_data["edges"]))
+    return viz_data
+
+def query_context(question, routed, trace):
+    chain = get_chain()
+    with trace.span("graph_query"):
+        context = chain.graph.query(routed.cypher, routed.params)[:chain.top_k]
+    trace.count("graph_query", len(context))
+    if routed.tier == "llm":
+        cypher_router.remember(question, routed.cypher)
+    return context
 
-# LangChain Graph
-graph = Neo4jGraph(url=URI, username=USER, password=PASSWORD)
+def answer_question(question, routed, trace):
+    context = query_context(question, routed, trace)
+    with trace.span("answer"):
+        return answer_from_context(question, context)
+
+# The visual fetch runs on this pool while the answer LLM call runs in the request thread
+executor = ThreadPoolExecutor(max_workers=int(os.environ.get("ASK_WORKERS", "8")))
+
+def traced_json(trace, outcome, payload, status=200):
+    """jsonify under a 'serialize' span, with the request's Server-Timing header"""
+    with trace.span("serialize"):
+        response = jsonify(payload)
+    response.status_code = status
+    response.headers["Server-Timing"] = trace.server_timing()
+    trace.finish(outcome)
+    return response
+
+def saturated_response(trace, error):
+    response = traced_json(trace, "rejected", {"error": str(error)}, 429)
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
 
 @app.route('/ask', methods=['POST'])
 def ask_graph():
-    driver = None
+    trace = RequestTrace()
     try:
         data = request.json
         question = data.get('question')
 
-        # 1. Generate Answer & Cypher
-        chain = GraphCypherQAChain.from_llm(
-            ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=GOOGLE_KEY),
-            graph=graph,
-            verbose=True,
-            return_intermediate_steps=True,
-            allow_dangerous_requests=True
-        )
-        result = chain.invoke(question)
-        answer_text = result["result"]
-        generated_cypher = result["intermediate_steps"][0]["query"]
-        
-        # 2. Determine Visualization Strategy
-        # If query is aggregating (counting), use Safe Mode. Otherwise, try Smart Mode.
-        is_aggregation = any(x in generated_cypher.upper() for x in ["COUNT(", "SUM(", "AVG(", "MAX(", "MIN("])
-        
-        viz_query = ""
-        if is_aggregation:
-            # Safe Mode: Just get a nice sample of the graph
-            viz_query = "MATCH (n)-[r]->(m) RETURN n,r,m LIMIT 25"
-        else:
-            # Smart Mode: Inject "RETURN *" to get the actual objects from the AI's query
-            # We strip the original RETURN and replace it with RETURN *
-            viz_query = re.sub(r"RETURN\s+.*", "RETURN * LIMIT 50", generated_cypher, flags=re.IGNORECASE | re.DOTALL)
-
-        # 3. Fetch Visual Data
-        viz_data = {"nodes": [], "edges": []}
-        driver = GraphDatabase.driver(URI, auth=(USER, PASSWORD))
-        
+        with trace.span("answer_cache"):
+            cached, cache_kind = answer_cache.lookup(question)
+        if cached is not None:
+            return traced_json(trace, "cache", {
+                "answer": cached["answer"],
+                "visual": cached["visual"],
+                "cache": cache_kind
+            })
+
+        def compute():
+            # 1. Cypher from rules / cache / LLM
+            with trace.span("cypher"):
+                routed = cypher_router.route(question)
+
+            # 2. Visual fetch starts as soon as the Cypher is known, overlapping the answer
+            visual_future = executor.submit(fetch_visual, routed.cypher, routed.params, trace)
+            answer_text = answer_question(question, routed, trace)
+            viz_data = visual_future.result()
+
+            answer_cache.store(question, routed.cypher, answer_text, viz_data)
+            return {
+                "answer": answer_text,
+                "visual": viz_data,
+                "cypher_source": routed.tier
+            }
+
+        # Identical questions in flight share one computation
+        return traced_json(trace, "ok", admission.run(normalize_question(question), compute))
+
+    except Saturated as e:
+        return saturated_response(trace, e)
+    except Exception as e:
+        return traced_json(trace, "error", {"error": str(e)}, 500)
+
+def _ndjson(event):
+    return json.dumps(event) + "\n"
+
+@app.route('/ask/stream', methods=['POST'])
+def ask_graph_stream():
+    """Streams NDJSON events: {"type": "cypher"}, then {"type": "graph"}, then {"type": "answer"}"""
+    data = request.json or {}
+    question = data.get('question')
+
+    # Headers are sent before the work is done, so stage timings go to /metrics only
+    trace = RequestTrace()
+
+    with trace.span("answer_cache"):
+        cached, cache_kind = answer_cache.lookup(question)
+
+    # Streams hold a slot for their whole lifetime (no coalescing); cache hits need none
+    acquired_at = None
+    if cached is None:
         try:
-            with driver.session() as session:
-                result_viz = session.run(viz_query)
-                
-                seen_nodes = set()
-                seen_edges = set()
-
-                for record in result_viz:
-                    for key, entity in record.items():
-                        
-                        # Nodes
-                        if hasattr(entity, 'labels') and hasattr(entity, 'element_id'):
-                            node_id = getattr(entity, 'element_id', str(entity.id))
-                            if node_id not in seen_nodes:
-                                props = dict(entity)
-                                # Smart Caption: Name > Title > Label
-                                caption = props.get('name') or props.get('title') or list(entity.labels)[0]
-                                group = list(entity.labels)[0] if entity.labels else "Generic"
-                                
-                                viz_data["nodes"].append({
-                                    "id": node_id,
-                                    "label": str(caption)[:20] + "..." if len(str(caption)) > 20 else str(caption),
-                                    "group": group,
-                                    "title": str(props) # Tooltip
-                                })
-                                seen_nodes.add(node_id)
-
-                        # Relationships
-                        elif hasattr(entity, 'start_node') and hasattr(entity, 'end_node'):
-                            rel_id = getattr(entity, 'element_id', str(entity.id))
-                            if rel_id not in seen_edges:
-                                start = getattr(entity.start_node, 'element_id', str(entity.start_node.id))
-                                end = getattr(entity.end_node, 'element_id', str(entity.end_node.id))
-                                
-                                viz_data["edges"].append({
-                                    "from": start,
-                                    "to": end,
-                                    "label": entity.type
-                                })
-                                seen_edges.add(rel_id)
+            acquired_at = admission.acquire()
+        except Saturated as e:
+            return saturated_response(trace, e)
+
+    def events():
+        try:
+            if cached is not None:
+                yield _ndjson({"type": "cypher", "cypher": cached["cypher"], "source": "cache", "cache": cache_kind})
+                yield _ndjson({"type": "graph", "visual": cached["visual"]})
+                yield _ndjson({"type": "answer", "answer": cached["answer"]})
+                trace.finish("cache")
+                return
+
+            with trace.span("cypher"):
+                routed = cypher_router.route(question)
+            yield _ndjson({"type": "cypher", "cypher": routed.cypher, "source": routed.tier})
+
+            visual_future = executor.submit(fetch_visual, routed.cypher, routed.params, trace)
+            answer_future = executor.submit(answer_question, question, routed, trace)
+            viz_data = visual_future.result()
+            yield _ndjson({"type": "graph", "visual": viz_data})
+            answer_text = answer_future.result()
+            yield _ndjson({"type": "answer", "answer": answer_text})
+
+            answer_cache.store(question, routed.cypher, answer_text, viz_data)
+            trace.finish("ok")
         except Exception as e:
-            print(f"Visual Fetch Failed: {e}")
-            # If Smart Mode fails, we don't crash, we just return the text answer
-            pass
-            
-        driver.close()
+            trace.finish("error")
+            yield _ndjson({"type": "error", "error": str(e)})
 
-        return jsonify({
-            "answer": answer_text,
-            "visual": viz_data
-        })
+    response = Response(stream_with_context(events()), mimetype="application/x-ndjson")
+    if acquired_at is not None:
+        response.call_on_close(lambda: admission.release(acquired_at))
+    return response
 
-    except Exception as e:
-        if driver: driver.close()
-        return jsonify({"error": str(e)}), 500
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify({
+        "cypher_router": cypher_router.stats(),
+        "answer_cache": answer_cache.stats(),
+        "admission": admission.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
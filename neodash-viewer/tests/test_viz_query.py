@@ -0,0 +1,48 @@
+"""
+Regression cases for api/_viz_query.py.
+Run with `python -m unittest discover tests` from neodash-viewer/ (no database needed).
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from _viz_query import derive_viz_query, scoped_variables
+
+
+def projected(cypher):
+    """The variable list of the projection's first WITH"""
+    query = derive_viz_query(cypher)
+    line = next(line for line in query.splitlines() if line.endswith("LIMIT $viz_rows"))
+    return line[len("WITH "):-len(" LIMIT $viz_rows")].split(", ")
+
+
+class ScopeTest(unittest.TestCase):
+    def test_pattern_comprehension_in_with_is_local(self):
+        self.assertEqual(projected(
+            "MATCH (t:Topic) WITH t, [(t)-->(x) | x.name] AS names RETURN t.name, names"
+        ), ["t"])
+
+    def test_pattern_comprehension_in_where_is_local(self):
+        self.assertEqual(projected("MATCH (t:Topic) WHERE size([(t)-->(x) | x]) > 3 RETURN t"), ["t"])
+
+    def test_list_comprehension_in_return(self):
+        self.assertEqual(projected("MATCH (n) RETURN [x IN collect(n) | x.name]"), ["n"])
+
+    def test_path_and_variable_length_rels(self):
+        scope, _ = scoped_variables("MATCH p=(a)-[r:REL*1..3]->(b) RETURN p")
+        self.assertEqual(scope, {"p": "path", "a": "node", "b": "node", "r": "rels"})
+
+    def test_function_call_is_not_a_node(self):
+        self.assertEqual(projected("MATCH (a)-[r]->(b) RETURN a, count(r) AS links"), ["a", "b", "r"])
+
+    def test_with_drops_unprojected_variables(self):
+        self.assertEqual(projected("MATCH (a)-[r]->(b) WITH a, count(b) AS degree RETURN a, degree"), ["a"])
+
+    def test_no_graph_variables(self):
+        self.assertIsNone(derive_viz_query("RETURN 1 AS one"))
+
+
+if __name__ == "__main__":
+    unittest.main()